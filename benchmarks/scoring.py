@@ -0,0 +1,204 @@
+# Microbenchmarks of the scoring kernels of src/helpers/comparison.py on generated strings:
+# identifiers of the code (env vars, YAML keys, camelCase names) and sentences of the docs.
+# The embedding model is replaced by a hashing encoder, so runs are offline and deterministic.
+#
+#   python -m benchmarks.scoring --out bench.json                  # run and save the results
+#   python -m benchmarks.scoring --compare bench.json              # run and compare with saved results
+#   python -m benchmarks.scoring --filter fuzz --sizes 10,50       # some of the benchmarks
+import os
+import sys
+import json
+import time
+import random
+import hashlib
+import argparse
+import platform
+import subprocess
+import statistics
+from contextlib import contextmanager
+import numpy as np
+from src.helpers import comparison
+
+SEED = 42
+DEFAULT_SIZES = [10, 50, 200]
+WORDS = ["user", "auth", "token", "service", "database", "url", "max", "retries", "timeout", "cache", "config",
+    "server", "client", "request", "response", "queue", "worker", "job", "payment", "order", "item", "price",
+    "email", "password", "host", "port", "path", "file", "log", "level", "debug", "api", "key", "secret", "region",
+    "bucket", "name", "id", "version", "build", "deploy", "pipeline", "test", "report", "metrics", "session"]
+
+# hashed character trigrams, stands for the model: same text, same vector
+class HashingModel:
+    def __init__(self, dim=64):
+        self.dim = dim
+
+    def encode(self, texts, batch_size=32):
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            padded = f"  {text.lower()} "
+            for i in range(len(padded) - 2):
+                digest = hashlib.md5(padded[i:i + 3].encode("utf-8")).digest()
+                vectors[row, digest[0] % self.dim] += 1
+        return vectors
+
+def identifier(rng):
+    words = rng.sample(WORDS, rng.randint(1, 4))
+    style = rng.choice(["snake", "env", "camel", "plain"])
+    if style == "snake":
+        return "_".join(words)
+    if style == "env":
+        return "_".join(words).upper()
+    if style == "camel":
+        return words[0] + "".join(w.capitalize() for w in words[1:])
+    return " ".join(words)
+
+def sentence(rng, min_words=5, max_words=25):
+    return " ".join(rng.choice(WORDS) for _ in range(rng.randint(min_words, max_words))).capitalize() + "."
+
+# code items against doc items, as parallents and common compare them
+def string_sets(size, seed=SEED):
+    rng = random.Random(seed + size)
+    code = [identifier(rng) for _ in range(size)]
+    docs = [rng.choice([identifier(rng), sentence(rng)]) for _ in range(size)]
+    return code, docs
+
+def reset_caches():
+    comparison.lcs_score.cache_clear()
+    comparison.cache.clear()
+
+# name -> function of size returning the callable to time
+def kernels():
+    def hybrid_score(size):
+        code, docs = string_sets(size)
+        return lambda: [comparison.hybrid_score(a, b, 0.5) for a in code for b in docs]
+
+    def lcs(size):
+        code, docs = string_sets(size)
+        return lambda: [comparison.longest_common_substring_score(a, b) for a in code for b in docs]
+
+    def normalize_string(size):
+        code, docs = string_sets(size)
+        return lambda: [comparison.normalize_string(s) for s in code * 10 + docs * 10]
+
+    def fuzzy_score_lists(size):
+        code, docs = string_sets(size)
+        return lambda: comparison.fuzzy_score_lists(code, docs)
+
+    # sklearn vectorizer per pair is slow, pairs are capped
+    def map_texts_fuzz(size):
+        code, docs = string_sets(size)
+        n = max(2, int(size ** 0.5))
+        return lambda: comparison.map_texts_fuzz(docs[:n], docs[-n:])
+
+    def hybrid_strings_lists_comparison(size):
+        code, docs = string_sets(size)
+        return lambda: comparison.hybrid_strings_lists_comparison(code, docs)
+
+    return {
+        "hybrid_score": hybrid_score,
+        "longest_common_substring_score": lcs,
+        "normalize_string": normalize_string,
+        "fuzzy_score_lists": fuzzy_score_lists,
+        "map_texts_fuzz": map_texts_fuzz,
+        "hybrid_strings_lists_comparison": hybrid_strings_lists_comparison,
+    }
+
+def measure(fn, repeat, min_time=0.05):
+    # calls per timing, so that fast kernels aren't measured at the timer resolution
+    number = 1
+    while True:
+        started = time.perf_counter()
+        for _ in range(number):
+            # memoized scores would turn every call after the first into cache hits
+            reset_caches()
+            fn()
+        if time.perf_counter() - started >= min_time or number >= 1 << 16:
+            break
+        number *= 2
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for _ in range(number):
+            reset_caches()
+            fn()
+        timings.append((time.perf_counter() - started) / number)
+    return {"min": min(timings), "median": statistics.median(timings), "number": number, "repeat": repeat}
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except Exception:
+        return None
+
+# vectors of the stub model don't go to the embeddings cache on disk
+@contextmanager
+def no_embedding_cache():
+    before = os.environ.get("EMBEDDING_CACHE")
+    os.environ["EMBEDDING_CACHE"] = "no"
+    try:
+        yield
+    finally:
+        if before is None:
+            del os.environ["EMBEDDING_CACHE"]
+        else:
+            os.environ["EMBEDDING_CACHE"] = before
+
+def run_benchmarks(sizes=None, repeat=5, name_filter=None):
+    comparison.embedding_model = HashingModel()
+    results = {}
+    with no_embedding_cache():
+        for name, make in kernels().items():
+            if name_filter and name_filter not in name:
+                continue
+            for size in sizes or DEFAULT_SIZES:
+                results[f"{name}[{size}]"] = measure(make(size), repeat)
+    return {
+        "meta": {"commit": git_commit(), "python": platform.python_version(), "machine": platform.machine(),
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S")},
+        "results": results,
+    }
+
+# ratios of current to baseline min times, benchmarks slower by more than threshold are regressions
+def compare(current, baseline, threshold=0.2):
+    rows = []
+    for name, result in current["results"].items():
+        if name not in baseline["results"]:
+            continue
+        ratio = result["min"] / baseline["results"][name]["min"]
+        rows.append((name, baseline["results"][name]["min"], result["min"], ratio, ratio > 1 + threshold))
+    return rows
+
+def print_results(results):
+    for name, result in results["results"].items():
+        print(f"{name:45} {result['min'] * 1000:10.3f} ms  (median {result['median'] * 1000:.3f} ms)")
+
+def print_comparison(rows):
+    for name, before, after, ratio, regression in rows:
+        mark = "  REGRESSION" if regression else ""
+        print(f"{name:45} {before * 1000:10.3f} -> {after * 1000:10.3f} ms  x{ratio:.2f}{mark}")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Scoring kernels benchmarks")
+    parser.add_argument("--out", help="JSON file to save the results to")
+    parser.add_argument("--compare", help="JSON file of previous results to compare with")
+    parser.add_argument("--threshold", type=float, default=0.2, help="slowdown ratio reported as a regression")
+    parser.add_argument("--sizes", default=",".join(map(str, DEFAULT_SIZES)), help="sizes of the string sets")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--filter", help="only benchmarks with this substring in the name")
+    args = parser.parse_args(argv)
+
+    results = run_benchmarks([int(s) for s in args.sizes.split(",")], args.repeat, args.filter)
+    print_results(results)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            rows = compare(results, json.load(f), args.threshold)
+        print()
+        print_comparison(rows)
+        if any(row[-1] for row in rows):
+            return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,5 +1,12 @@
 import os
+import io
+import sys
+import json
+import time
 import traceback
+import multiprocessing
+from contextlib import redirect_stdout, redirect_stderr
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 
 def start(base):
     from src.ucases.parallents import report as parallel_entities_report
@@ -7,10 +14,15 @@ def start(base):
     from src.ucases.common import report as common_finding_report
     from src.ucases.endpoints import report as endpoints_report
     from src.core.project import Project
+    from src.core.metrics import metrics
+    from src.core import report
 
     if not os.path.isdir(base):
-        print(f"Path {base} doesn't exist")
+        print(f"Path {base} doesn't exist", file=sys.stderr)
         exit()
+    started = time.perf_counter()
+    reports = []
+    error = None
     try:
         ucases_to_run = [
             #common_finding_report,
@@ -18,23 +30,130 @@ def start(base):
             #constants_report,
             endpoints_report
         ]
+        metrics.reset()
+        if report.report_format() == "jsonl":
+            # the run record of a project which fails to scan still names it
+            report.stream_fields["project"] = base
         p = Project(base)
-        for uc in ucases_to_run:
-            r = uc(p)
-            r.print()
+        if report.report_format() == "jsonl":
+            report.write_record({"type": "project", "skipped": dict(p.skipped_counts)})
+        elif p.skipped_counts:
+            print(f"Skipped files: {p.skipped_summary()}")
+        if ucases_concurrent() and len(ucases_to_run) > 1:
+            # reports are printed in order, the model is shared through the embedding service
+            from src.helpers.comparison import start_embedding_service
+            start_embedding_service()
+            with ThreadPoolExecutor(max_workers=len(ucases_to_run)) as pool:
+                reports = list(pool.map(lambda uc: uc(p), ucases_to_run))
+            for r in reports:
+                r.print()
+        else:
+            for uc in ucases_to_run:
+                r = uc(p)
+                r.print()
+                reports.append(r)
+        if metrics_file():
+            write_metrics(metrics_file(), base, time.perf_counter() - started, reports)
     except Exception as e:
-        print(e)
+        error = str(e)
+        print(e, file=sys.stderr)
         traceback.print_exc()
+    if report.report_format() == "jsonl":
+        report.write_run_summary(reports, time.perf_counter() - started, error)
 
 
-MULTI_FOLDER = os.getenv("MULTI_FOLDER")
-PROJECT_PATH = os.getenv("PROJECT_PATH")
-if MULTI_FOLDER:
-    for name in os.listdir(MULTI_FOLDER):
-        full_path = os.path.join(MULTI_FOLDER, name)
+# METRICS_FILE=metrics.json, or metrics-{project}.json for a file per project of MULTI_FOLDER
+def metrics_file():
+    return os.getenv("METRICS_FILE")
+
+def write_metrics(path, base, total_time, reports):
+    from src.core.metrics import metrics
+    data = {"project": base, "total_time": total_time, **metrics.snapshot(),
+        "usecases": [r.metrics_dict() for r in reports]}
+    with open(path.format(project=os.path.basename(os.path.normpath(base))), "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=2)
+
+# jsonl records on stdout are not mixed with headlines
+def headline(text):
+    stream = sys.stderr if os.getenv("REPORT_FORMAT") == "jsonl" else sys.stdout
+    print(text, file=stream)
+
+def ucases_concurrent():
+    return os.getenv("UCASES_CONCURRENT") == "yes"
+
+def fleet_workers():
+    return int(os.getenv("FLEET_WORKERS", "1"))
+
+# Workers share the loaded model only when forked. There is no fork on Windows, and on macOS it's unsafe
+# once torch and system frameworks are loaded, projects run one by one there
+def fleet_start_method():
+    if sys.platform.startswith("linux") and "fork" in multiprocessing.get_all_start_methods():
+        return "fork"
+    return None
+
+def run_sequential(folder):
+    for name in os.listdir(folder):
+        full_path = os.path.join(folder, name)
         if os.path.isdir(full_path):
-            print(f"============ PROJECT {name} ==============")
+            headline(f"============ PROJECT {name} ==============")
             start(full_path)
+
+# One project in a fleet worker, its output is captured to be printed in order by the parent
+def run_captured(base):
+    started = time.time()
+    # records and diagnostics are kept apart, the parent writes them to its stdout and stderr
+    out, err = io.StringIO(), io.StringIO()
+    with redirect_stdout(out), redirect_stderr(err):
+        start(base)
+        # pool workers leave without atexit handlers
+        from src.helpers.comparison import flush_embeddings_cache
+        flush_embeddings_cache()
+    return out.getvalue(), err.getvalue(), time.time() - started
+
+def init_fleet_worker(bridge):
+    # projects run side by side, each one parses its files in place
+    os.environ["DOCTOR_WORKERS"] = "1"
+    from src.helpers.comparison import use_embedding_service
+    use_embedding_service(bridge.connect())
+
+# Projects of the folder run over a pool of forked workers. The model is loaded once in this process,
+# the workers send strings to encode to its embedding service, which batches requests of all projects together
+def run_fleet(folder, workers):
+    names = [name for name in sorted(os.listdir(folder)) if os.path.isdir(os.path.join(folder, name))]
+    from src.helpers.comparison import model_singleton, store_singleton, start_embedding_service
+    from src.helpers.embedding_service import ProcessBridge
+    model_singleton()
+    store_singleton()
+    bridge = ProcessBridge(workers)
+    runtimes = []
+    context = multiprocessing.get_context(fleet_start_method())
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context, initializer=init_fleet_worker, initargs=(bridge,)) as pool:
+        # all workers are forked on the first submit, threads of the service start after that
+        futures = [pool.submit(run_captured, os.path.join(folder, name)) for name in names]
+        bridge.start(start_embedding_service())
+        for name, future in zip(names, futures):
+            headline(f"============ PROJECT {name} ==============")
+            try:
+                output, errors, seconds = future.result()
+            except Exception as e:
+                output, errors, seconds = "", f"Worker failed: {e}\n", None
+            print(output, end="")
+            print(errors, end="", file=sys.stderr)
+            runtimes.append((name, seconds))
+    bridge.close()
+    headline("============ RUNTIMES ==============")
+    for name, seconds in sorted(runtimes, key=lambda r: -(r[1] or 0)):
+        headline(f"{name}: {seconds:.1f}s" if seconds is not None else f"{name}: failed")
+
+
+MULTI_FOLDER = os.getenv("MULTI_FOLDER")
+PROJECT_PATH = os.getenv("PROJECT_PATH")
+if MULTI_FOLDER and fleet_workers() > 1 and fleet_start_method():
+    run_fleet(MULTI_FOLDER, fleet_workers())
+elif MULTI_FOLDER:
+    if fleet_workers() > 1:
+        print(f"FLEET_WORKERS is not supported on {sys.platform}, projects are analyzed one by one", file=sys.stderr)
+    run_sequential(MULTI_FOLDER)
 else:
     base = PROJECT_PATH if PROJECT_PATH else (input("Input the full path to the project: ")).strip()
     start(base)
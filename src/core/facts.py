@@ -0,0 +1,147 @@
+# Facts every use case needs from a single file:
+# - key groups of YAML, JSON sections of the same level
+# - env vars
+# - strings the code validates against
+# - imports
+# - main marker, the file is meant to be run as a script
+# Key groups are read from a stream of parser events by default, DATA_KEYS_MODE=full loads whole documents.
+# Every file is read once here, plugins and data keys parse the same text.
+# Files are parsed independently from each other, so for big projects it's done over a process pool.
+# Results always come in the order of the input files
+import io
+import os
+import sys
+import json
+import yaml
+import hashlib
+from concurrent.futures import ProcessPoolExecutor
+from src.helpers.languages import invoke_lang, ext_lang
+from src.helpers.datakeys import unknown_tag_handler, yaml_key_groups, json_key_groups, max_size, max_depth
+
+# less files than that are faster parsed in place than shipped to workers
+MIN_FILES_FOR_POOL = 64
+
+class IgnoreUnknownTagsLoader(yaml.SafeLoader):
+    """
+    Custom loader that ignores unknown YAML tags instead of throwing an error.
+    """
+
+IgnoreUnknownTagsLoader.add_multi_constructor('', unknown_tag_handler)
+
+def collect_yaml_keys(data, parent_key, key_groups, type):
+    if isinstance(data, dict):
+        keys = list(data.keys())
+        if keys:
+            key_groups.append((type, parent_key, keys))
+        for key, value in data.items():
+            collect_yaml_keys(value, key, key_groups, type)
+
+# YAML or JSON for data files keys are collected from, None for others
+def data_type(file_path):
+    file = os.path.basename(file_path)
+    ext = file.lower().split('.')[-1]
+    if ext in ("yaml", "yml"):
+        return "YAML"
+    if ext == "json" and "package" not in file:
+        return "JSON"
+    return None
+
+# only data files and files of known languages are read, others have no facts
+def is_read(file_path):
+    return data_type(file_path) is not None or file_path.lower().split('.')[-1] in ext_lang
+
+# text of the file bytes, newlines translated as in text mode
+def decode_text(source):
+    return io.StringIO(source.decode("utf-8"), newline=None).read()
+
+def extract_file_facts(file_path):
+    return extract_file(file_path)[0]
+
+# facts of the file and sha1 of the bytes they were extracted from, None if the file is not read
+def extract_file(file_path):
+    root, file = os.path.split(file_path)
+    ext = file.lower().split('.')[-1]
+    facts = {"key_groups": [], "env_vars": [], "comparisons": [], "imports": [], "main": False}
+    if not is_read(file_path):
+        return facts, None
+    data = data_type(file_path)
+    try:
+        if data and os.path.getsize(file_path) > max_size():
+            print(f"{file_path}: too big to collect keys", file=sys.stderr)
+            return facts, None
+        with open(file_path, "rb") as f:
+            source = f.read()
+    except OSError as e:
+        print(f"{file_path}: {e}", file=sys.stderr)
+        return facts, None
+    digest = hashlib.sha1(source).hexdigest()
+    try:
+        content = decode_text(source)
+    except UnicodeDecodeError as e:
+        print(f"{file_path}: {e}", file=sys.stderr)
+        return facts, digest
+
+    if data:
+        facts["key_groups"] = data_key_groups(content, root, data)
+    if ext != "json" or "package" in file:
+        facts["env_vars"] = invoke_fact(file_path, "fetch_env_vars", content)
+
+    facts["comparisons"] = invoke_fact(file_path, "fetch_comparisons", content)
+    if ext == "py" and "__init__" not in file:
+        facts["imports"] = invoke_fact(file_path, "fetch_imports", content)
+        try:
+            facts["main"] = bool(invoke_lang(file_path, "fetch_main_marker", content))
+        except Exception:
+            # the same error is already printed for the other facts
+            pass
+    if ext_lang.get(ext) == "javascript":
+        facts["imports"] = invoke_fact(file_path, "fetch_imports", content)
+    return facts, digest
+
+# settings which change extracted facts, stored facts extracted with others are not reused
+def facts_settings():
+    return {"data_keys_mode": data_keys_mode(), "data_max_depth": max_depth(), "data_max_size": max_size()}
+
+def data_keys_mode():
+    return os.getenv("DATA_KEYS_MODE", "stream")
+
+# content - text of the data file
+def data_key_groups(content, root, type):
+    if data_keys_mode() != "full":
+        stream = io.StringIO(content)
+        return yaml_key_groups(stream, root, type) if type == "YAML" else json_key_groups(stream, root, type)
+    try:
+        data = yaml.load(content, Loader=IgnoreUnknownTagsLoader) if type == "YAML" else json.loads(content)
+    except Exception as e:
+        print(e, file=sys.stderr)
+        data = {}
+    key_groups = []
+    collect_yaml_keys(data, root, key_groups, type)
+    return key_groups
+
+# one broken file shouldn't stop the analysis of the others
+def invoke_fact(file_path, method_name, content=None):
+    try:
+        res = invoke_lang(file_path, method_name, content)
+    except Exception as e:
+        print(f"{file_path}: {e}", file=sys.stderr)
+        return []
+    return sorted(res) if res else []
+
+def workers_count():
+    workers = os.getenv("DOCTOR_WORKERS")
+    return int(workers) if workers else (os.cpu_count() or 1)
+
+# workers end with the run, syntax trees kept for incremental parsing would never be reused
+def init_facts_worker():
+    os.environ["JS_TREE_CACHE_MB"] = "0"
+
+# list of facts for file_paths in the same order, (facts, digest) pairs with digests (see extract_file)
+def extract_facts(file_paths, workers=None, digests=False):
+    workers = workers or workers_count()
+    extract = extract_file if digests else extract_file_facts
+    if workers <= 1 or len(file_paths) < MIN_FILES_FOR_POOL:
+        return [extract(file_path) for file_path in file_paths]
+    chunksize = max(1, min(64, len(file_paths) // (workers * 4)))
+    with ProcessPoolExecutor(max_workers=workers, initializer=init_facts_worker) as pool:
+        return list(pool.map(extract, file_paths, chunksize=chunksize))
@@ -0,0 +1,101 @@
+# Facts of project files kept between runs in SQLite, one database per project in a cache dir.
+# A file is parsed again only if its size, mtime and content digest say it changed,
+# the rest of the facts come from the database. The digest of a parsed file is taken from the bytes
+# extraction read, files extraction doesn't read have no digest, their facts don't depend on the content
+import os
+import json
+import time
+import sqlite3
+import hashlib
+from src.core.facts import facts_settings
+
+# bump when facts extraction changes, facts stored by older versions are extracted again
+FACTS_VERSION = 6
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "doctor", "facts")
+# mtime granularity of some filesystems. A file stored within this window before the scan
+# may have been changed again without mtime change, its digest is checked
+RACY_WINDOW_NS = 2 * 10**9
+
+# FACTS_VERSION and the settings the facts were extracted with
+def facts_version():
+    settings = json.dumps(facts_settings(), sort_keys=True)
+    return f"{FACTS_VERSION}-{hashlib.sha1(settings.encode('utf-8')).hexdigest()[:12]}"
+
+def file_digest(file_path):
+    h = hashlib.sha1()
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 16), b""):
+            h.update(block)
+    return h.hexdigest()
+
+class FactStore:
+    def __init__(self, project_root, db_path=None):
+        if not db_path:
+            cache_dir = os.getenv("FACT_STORE_DIR", DEFAULT_CACHE_DIR)
+            os.makedirs(cache_dir, exist_ok=True)
+            name = hashlib.sha1(os.path.abspath(project_root).encode("utf-8")).hexdigest()
+            db_path = os.path.join(cache_dir, name + ".sqlite")
+        self.conn = sqlite3.connect(db_path, timeout=30)
+        self.conn.execute("""CREATE TABLE IF NOT EXISTS files (
+            path TEXT PRIMARY KEY,
+            mtime_ns INTEGER,
+            size INTEGER,
+            digest TEXT,
+            scanned_ns INTEGER,
+            version TEXT,
+            facts TEXT
+        )""")
+        self.version = facts_version()
+        self.extracted = 0
+        self.reused = 0
+        # paths extracted again by the last sync
+        self.extracted_paths = []
+
+    def close(self):
+        self.conn.close()
+
+    # facts of file_paths in the same order, extract(paths, digests=True) -> [(facts, digest)]
+    # is called only for changed files. Files removed since the walk get facts of a file which can't be read
+    def sync(self, file_paths, extract):
+        stored = {row[0]: row[1:] for row in self.conn.execute(
+            "SELECT path, mtime_ns, size, digest, scanned_ns, version, facts FROM files")}
+        scanned_ns = time.time_ns()
+        facts = {}
+        changed = []
+        touched = []
+        for path in file_paths:
+            try:
+                st = os.stat(path)
+            except FileNotFoundError:
+                changed.append((path, None))
+                continue
+            row = stored.get(path)
+            if row is None or row[4] != self.version or row[1] != st.st_size:
+                changed.append((path, st))
+                continue
+            mtime_ns, _, digest, stored_scanned_ns, _, stored_facts = row
+            if mtime_ns != st.st_mtime_ns or mtime_ns > stored_scanned_ns - RACY_WINDOW_NS:
+                if digest is not None and file_digest(path) != digest:
+                    changed.append((path, st))
+                    continue
+                touched.append((st.st_mtime_ns, scanned_ns, path))
+            facts[path] = json.loads(stored_facts)
+
+        new_facts = extract([path for path, _ in changed], digests=True)
+        rows = []
+        for (path, st), (file_facts, digest) in zip(changed, new_facts):
+            facts[path] = file_facts
+            if st is not None:
+                rows.append((path, st.st_mtime_ns, st.st_size, digest, scanned_ns, self.version,
+                    json.dumps(file_facts, default=str)))
+
+        current = set(file_paths) - {path for path, st in changed if st is None}
+        with self.conn:
+            self.conn.executemany("INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?, ?, ?)", rows)
+            self.conn.executemany("UPDATE files SET mtime_ns = ?, scanned_ns = ? WHERE path = ?", touched)
+            self.conn.executemany("DELETE FROM files WHERE path = ?", [(path,) for path in stored if path not in current])
+
+        self.extracted_paths = [path for path, _ in changed]
+        self.extracted += len(changed)
+        self.reused += len(file_paths) - len(changed)
+        return [facts[path] for path in file_paths]
@@ -0,0 +1,53 @@
+# Where the time of a run goes: seconds per phase and counters, shared by all use cases.
+# Phases: walk, parse, read, chunking, indexing, retrieval, embedding, scoring, reporting.
+# Counters: files_read (docs and sources read by facts extraction), facts_extracted, facts_reused, strings_encoded,
+# embedding_cache_hits, pairs_compared, chunks_skipped (by the lexical retrieval), retrieval_full_scans.
+# Use cases running in threads add up their phases, so the sum can be more than the wall time
+import time
+import threading
+from contextlib import contextmanager
+from collections import defaultdict
+
+class Metrics:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.phases = defaultdict(float)
+            self.counters = defaultdict(int)
+
+    @contextmanager
+    def phase(self, name):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - started
+            with self.lock:
+                self.phases[name] += elapsed
+
+    def count(self, name, n=1):
+        with self.lock:
+            self.counters[name] += n
+
+    def snapshot(self):
+        with self.lock:
+            return {"phases": dict(self.phases), "counters": dict(self.counters)}
+
+    # what happened since an earlier snapshot
+    def since(self, earlier):
+        now = self.snapshot()
+        return {
+            kind: {name: value - earlier[kind].get(name, 0) for name, value in now[kind].items()
+                if value != earlier[kind].get(name, 0)}
+            for kind in ("phases", "counters")
+        }
+
+metrics = Metrics()
+
+def format_metrics(data):
+    phases = ", ".join(f"{name} {seconds:.2f}s" for name, seconds in sorted(data["phases"].items(), key=lambda p: -p[1]))
+    counters = ", ".join(f"{name} {value}" for name, value in sorted(data["counters"].items()))
+    return "; ".join(part for part in (phases, counters) if part)
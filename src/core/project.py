@@ -1,29 +1,225 @@
 import os
-from src.helpers.exclusions import is_file_to_skip
+import threading
+from collections import OrderedDict, Counter
+from src.helpers.exclusions import is_file_to_skip, is_dir_to_skip, is_ignored, respect_gitignore, GitIgnore
+from src.core.facts import extract_facts, is_read
+from src.core.factstore import FactStore
+from src.core.walker import walk, walk_threads, classify_files
+from src.core.metrics import metrics
 
 class WalkItem:
-    def __init__(self, root, dirs, files):
+    def __init__(self, root, dirs, files, gitignores=()):
         self.root = root
         self.dirs = dirs
         filtered_files = []
         for file in files:
             file_path = os.path.join(root, file)
-            if is_file_to_skip(file_path):
+            if is_file_to_skip(file_path) or is_ignored(file_path, gitignores):
                 continue
             filtered_files.append(file)
         self.files = filtered_files
+        # all files of the folder in walk order, also the skipped ones, for use cases looking at names only
+        self.listed = list(filtered_files)
+        # files not to be read (binary, oversized, generated...) -> reason, see src/core/walker.py
+        self.skipped = {}
 
+# size of the text in the file, utf-8
+def text_bytes(value):
+    return len(value) if value.isascii() else len(value.encode("utf-8"))
+
+# Files contents shared by use cases. Least recently used ones are dropped above max_bytes (utf-8 size)
+class ContentCache:
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.items = OrderedDict()
+        self.size = 0
+        self.lock = threading.Lock()
+
+    def get(self, key, load):
+        with self.lock:
+            if key in self.items:
+                self.items.move_to_end(key)
+                return self.items[key]
+        value = load()
+        size = text_bytes(value)
+        with self.lock:
+            if size <= self.max_bytes and key not in self.items:
+                self.items[key] = value
+                self.size += size
+                while self.size > self.max_bytes:
+                    _, old = self.items.popitem(last=False)
+                    self.size -= text_bytes(old)
+        return value
+
+def cache_limit_bytes():
+    return int(float(os.getenv("DOCTOR_CACHE_MB", "256")) * 1024 * 1024)
+
+# folders (or files) of the project with Markdown documentation, besides README.md
+def doc_roots():
+    return [root.strip() for root in os.getenv("DOC_ROOTS", "docs").split(",") if root.strip()]
+
+def is_markdown(file_path):
+    return file_path.lower().endswith((".md", ".markdown")) and os.path.getsize(file_path) > 0
+
+# GitIgnore of the project folders from the root down to folder (included)
+def gitignores_down_to(project_root, folder):
+    if not respect_gitignore():
+        return []
+    folders = [project_root]
+    rel = os.path.relpath(folder, project_root)
+    if rel != ".":
+        for part in rel.split(os.sep):
+            folders.append(os.path.join(folders[-1], part))
+    return [GitIgnore.load(f) for f in folders if os.path.isfile(os.path.join(f, ".gitignore"))]
+
+# README.md first, then Markdown files of doc roots in a stable order.
+# Folders inside doc roots are pruned and files ignored the same way as in the project scan
+def find_docs(project_root):
+    doc_paths = []
+    readme_path = os.path.join(project_root, "README.md")
+    if os.path.exists(readme_path) and os.path.getsize(readme_path) > 0:
+        doc_paths.append(readme_path)
+    for root in doc_roots():
+        path = os.path.join(project_root, root)
+        if os.path.isfile(path):
+            if is_markdown(path) and not is_ignored(path, gitignores_down_to(project_root, os.path.dirname(path))):
+                doc_paths.append(path)
+            continue
+        if not os.path.isdir(path):
+            continue
+        gitignores = {path: gitignores_down_to(project_root, os.path.dirname(path))}
+        for dir_path, dirs, files in os.walk(path):
+            dir_gitignores = gitignores.pop(dir_path, [])
+            if ".gitignore" in files and respect_gitignore():
+                dir_gitignores = dir_gitignores + [GitIgnore.load(dir_path)]
+            dirs[:] = sorted(d for d in dirs if not is_dir_to_skip(os.path.join(dir_path, d), dir_gitignores))
+            for d in dirs:
+                gitignores[os.path.join(dir_path, d)] = dir_gitignores
+            for file in sorted(files):
+                file_path = os.path.join(dir_path, file)
+                if is_markdown(file_path) and not is_ignored(file_path, dir_gitignores):
+                    doc_paths.append(file_path)
+    return list(dict.fromkeys(os.path.normpath(p) for p in doc_paths))
+
+def read_file(file_path):
+    metrics.count("files_read")
+    with metrics.phase("read"), open(file_path, "r", encoding="utf-8") as f:
+        return f.read()
+
+# One scan of the project shared by all use cases:
+# files tree, contents, parsed facts, documentation chunks and their indexes are computed once and on demand
 class Project:
     def __init__(self, project_root):
+        with metrics.phase("walk"):
+            self.scan(project_root)
+
+    def scan(self, project_root):
         self.project_root = project_root
         self.walk_items = []
-        for root, dirs, files in os.walk(project_root):
+        self.file_facts = None
+        # use cases can run in threads
+        self.facts_lock = threading.Lock()
+        self.contents = ContentCache(cache_limit_bytes())
+        self.chunks = {}
+        self.indexes = {}
+        # excluded folders are pruned in place, so os.walk never enters them
+        gitignores = {project_root: []}
+        threads = walk_threads()
+        sizes = {}
+        for root, dirs, files, root_sizes in walk(project_root, threads):
             if is_file_to_skip(root):
+                dirs[:] = []
                 continue
-            self.walk_items.append(WalkItem(root, dirs, files))
+            root_gitignores = gitignores.pop(root, [])
+            if ".gitignore" in files and respect_gitignore():
+                root_gitignores = root_gitignores + [GitIgnore.load(root)]
+            dirs[:] = [d for d in dirs if not is_dir_to_skip(os.path.join(root, d), root_gitignores)]
+            for d in dirs:
+                gitignores[os.path.join(root, d)] = root_gitignores
+            witem = WalkItem(root, dirs, files, root_gitignores)
+            for file in witem.files:
+                sizes[os.path.join(root, file)] = root_sizes[file]
+            self.walk_items.append(witem)
+
+        file_paths = self.file_paths()
+        reasons = classify_files(file_paths, [sizes[f] for f in file_paths], threads)
+        skipped = {file_path: reason for file_path, reason in zip(file_paths, reasons) if reason}
+        self.skipped_counts = Counter(skipped.values())
+        for witem in self.walk_items:
+            for file in witem.files:
+                file_path = os.path.join(witem.root, file)
+                if file_path in skipped:
+                    witem.skipped[file] = skipped[file_path]
+            witem.files = [file for file in witem.files if file not in witem.skipped]
         
-        readme_path = os.path.join(project_root, "README.md")
-        if os.path.exists(readme_path) and os.path.getsize(readme_path) > 0:
-            self.doc_path = os.path.join(project_root, "README.md")
-        else:
-            raise Exception("Currently only README.md is supported as documentation, but it was not found in the project")
\ No newline at end of file
+        # documentation files not to be read (binary, wrong encoding...) are skipped the same way as project files
+        doc_paths = find_docs(project_root)
+        reasons = classify_files(doc_paths, [os.path.getsize(p) for p in doc_paths], threads)
+        walked = {os.path.normpath(f) for f in sizes}
+        self.skipped_counts.update(reason for doc_path, reason in zip(doc_paths, reasons) if reason and doc_path not in walked)
+        self.doc_paths = [doc_path for doc_path, reason in zip(doc_paths, reasons) if not reason]
+        if not self.doc_paths:
+            raise Exception("No documentation found in the project: README.md or Markdown files in " + ", ".join(doc_roots()))
+
+    def file_paths(self):
+        return [os.path.join(witem.root, file) for witem in self.walk_items for file in witem.files]
+
+    # facts of every project file (see src/core/facts.py), extracted once for all use cases.
+    # Facts of unchanged files are taken from the previous run, FACT_STORE=no disables it
+    def facts(self):
+        with self.facts_lock:
+            if self.file_facts is None:
+                file_paths = self.file_paths()
+                with metrics.phase("parse"):
+                    if os.getenv("FACT_STORE") == "no":
+                        facts = extract_facts(file_paths)
+                        extracted = file_paths
+                    else:
+                        store = FactStore(self.project_root)
+                        try:
+                            facts = store.sync(file_paths, extract_facts)
+                        finally:
+                            store.close()
+                        extracted = store.extracted_paths
+                        metrics.count("facts_reused", len(file_paths) - len(extracted))
+                    metrics.count("facts_extracted", len(extracted))
+                    # extraction reads every data file and file of a known language once, in pool workers too
+                    metrics.count("files_read", sum(1 for file_path in extracted if is_read(file_path)))
+                self.file_facts = dict(zip(file_paths, facts))
+        return self.file_facts
+
+    def read(self, file_path):
+        return self.contents.get(file_path, lambda: read_file(file_path))
+
+    # contents of the documentation files, in the order of doc_paths
+    def doc_contents(self):
+        return [self.read(doc_path) for doc_path in self.doc_paths]
+
+    def doc_content(self):
+        return "\n\n".join(self.doc_contents())
+
+    # chunks never span two documentation files
+    def doc_chunks(self, chunk_size=500, chunk_overlap=50):
+        from src.helpers.readme import split_text_to_chunks
+        key = (chunk_size, chunk_overlap)
+        if key not in self.chunks:
+            with metrics.phase("chunking"):
+                self.chunks[key] = [chunk for content in self.doc_contents()
+                    for chunk in split_text_to_chunks(content, chunk_size, chunk_overlap)]
+        return self.chunks[key]
+
+    # inverted index (see src/helpers/search.py) of doc_chunks, or of whole documentation files without chunk_size
+    def doc_index(self, chunk_size=None, chunk_overlap=0):
+        from src.helpers.search import InvertedIndex
+        key = (chunk_size, chunk_overlap)
+        if key not in self.indexes:
+            texts = self.doc_contents() if chunk_size is None else self.doc_chunks(chunk_size, chunk_overlap)
+            with metrics.phase("indexing"):
+                self.indexes[key] = InvertedIndex(texts)
+        return self.indexes[key]
+
+    def doc_name(self, doc_path):
+        return os.path.splitext(os.path.relpath(doc_path, self.project_root))[0]
+
+    def skipped_summary(self):
+        return ", ".join(f"{reason} {count}" for reason, count in sorted(self.skipped_counts.items()))
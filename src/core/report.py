@@ -1,8 +1,51 @@
+import os
+import sys
+import json
+import time
+import threading
+from src.core.metrics import metrics, format_metrics
+
+# REPORT_FORMAT=jsonl writes every advice and meta item as a JSON line the moment it's added,
+# to REPORT_OUTPUT file (appended) or stdout. A summary record closes each use case, a run record closes the run.
+# Items without a score have no "score" field.
+# Diagnostics go to stderr, so stdout has records only
+stream_lock = threading.Lock()
+# (path, file descriptor) of REPORT_OUTPUT
+stream_file = None
+# added to every record, e.g. the project when many are analyzed
+stream_fields = {}
+
+def report_format():
+    return os.getenv("REPORT_FORMAT", "text")
+
+# numpy numbers (scores) as numbers, anything else not serializable as text
+def json_default(value):
+    if hasattr(value, "item"):
+        return value.item()
+    return str(value)
+
+def write_record(record):
+    global stream_file
+    line = json.dumps({**stream_fields, **record}, default=json_default) + "\n"
+    with stream_lock:
+        path = os.getenv("REPORT_OUTPUT")
+        if not path:
+            # stdout is looked up every time, it can be redirected to capture output of a project
+            sys.stdout.write(line)
+            sys.stdout.flush()
+            return
+        if stream_file is None or stream_file[0] != path:
+            stream_file = (path, os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644))
+        # the whole line in one write to a file opened for appending,
+        # so lines of processes writing to the same file don't mix
+        os.write(stream_file[1], line.encode("utf-8"))
+
 class Item:
-    def __init__(self, template, subs, compiled):
+    def __init__(self, template, subs, compiled, score=None):
         self.template = template
         self.subs = subs
         self.compiled = compiled
+        self.score = score
 
     def __str__(self):
         return self.compiled
@@ -19,22 +62,37 @@ class Report:
         self.debug = []
         self.advices = []
         self.execution_time = None
+        # phases and counters of this use case, set by finish()
+        self.metrics = None
+        self.started = time.perf_counter()
+        self.metrics_start = metrics.snapshot()
+        self.streaming = report_format() == "jsonl"
 
     def format(self, template, subs):
         new_t = tuple(", ".join(map(str, x)) if isinstance(x, list) else x for x in subs)
         return template.format(*new_t)
 
-    def advice_add(self, template, subs):
+    def advice_add(self, template, subs, score=None):
         compiled = self.format(template, subs)
-        item = Item(template, subs, compiled)
+        item = Item(template, subs, compiled, score)
         self.advices.append(item)
+        self.stream("advice", item)
         return compiled
 
-    def meta_add(self, template, subs):
+    def meta_add(self, template, subs, score=None):
         compiled = self.format(template, subs)
-        item = Item(template, subs, compiled)
+        item = Item(template, subs, compiled, score)
         self.meta.append(item)
+        self.stream("meta", item)
         return compiled
+
+    def stream(self, kind, item):
+        if self.streaming:
+            record = {"type": kind, "usecase": self.usecase, "template": item.template, "subs": list(item.subs),
+                "text": item.compiled}
+            if item.score is not None:
+                record["score"] = item.score
+            write_record(record)
     
     def debug_add(self, template, subs):
         compiled = self.format(template, subs)
@@ -43,8 +101,34 @@ class Report:
         return compiled
 
 
+    # called by the use case when its analysis is over
+    def finish(self):
+        self.execution_time = time.perf_counter() - self.started
+        self.metrics = metrics.since(self.metrics_start)
+        if self.streaming:
+            write_record({"type": "summary", "usecase": self.usecase, "advices": len(self.advices),
+                "meta": len(self.meta), **self.metrics_dict()})
+
+    def metrics_dict(self):
+        return {"usecase": self.usecase, "execution_time": self.execution_time, **(self.metrics or {})}
+
+    # text output at the end, in jsonl mode everything is already written
     def print(self):
-        print("# " + self.usecase + "\n")
-        print("\n".join([item.compiled for item in self.meta]))
-        print("\n".join([item.compiled for item in self.advices]))
-        print("=========================================")
\ No newline at end of file
+        if self.streaming:
+            return
+        with metrics.phase("reporting"):
+            print("# " + self.usecase + "\n")
+            print("\n".join([item.compiled for item in self.meta]))
+            print("\n".join([item.compiled for item in self.advices]))
+            if self.execution_time is not None:
+                details = format_metrics(self.metrics)
+                print(f"Time: {self.execution_time:.2f}s" + (f" ({details})" if details else ""))
+            print("=========================================")
+
+# the last record of a run: totals of its use cases, and the error if the run failed
+def write_run_summary(reports, execution_time, error=None):
+    record = {"type": "run", "usecases": [r.usecase for r in reports], "advices": sum(len(r.advices) for r in reports),
+        "meta": sum(len(r.meta) for r in reports), "execution_time": execution_time}
+    if error is not None:
+        record["error"] = error
+    write_record(record)
@@ -0,0 +1,92 @@
+# Files tree walk over os.scandir and cheap classification of files before any use case reads them.
+# Listing folders and sniffing files can be done in threads, which pays off on network filesystems
+import os
+import codecs
+from concurrent.futures import ThreadPoolExecutor
+
+SNIFF_BYTES = 8192
+GENERATED_SUFFIXES = (".min.js", ".min.css", "-min.js", ".bundle.js", ".chunk.js", ".js.map", ".css.map")
+
+def walk_threads():
+    return int(os.getenv("WALK_THREADS", "1"))
+
+def max_file_size():
+    return int(float(os.getenv("MAX_FILE_SIZE_KB", "1024")) * 1024)
+
+def max_line_length():
+    return int(os.getenv("MAX_LINE_LENGTH", "1000"))
+
+# Folders and files (with sizes) of one folder, in os.scandir order like os.walk.
+# As in os.walk, symlinks to folders are listed with the folders (links), but not walked into
+def scan_dir(path):
+    dirs = []
+    files = []
+    sizes = {}
+    links = set()
+    with os.scandir(path) as it:
+        for entry in it:
+            try:
+                if entry.is_dir():
+                    dirs.append(entry.name)
+                    if entry.is_symlink():
+                        links.add(entry.name)
+                elif entry.is_file():
+                    files.append(entry.name)
+                    sizes[entry.name] = entry.stat().st_size
+            except OSError:
+                continue
+    return dirs, files, sizes, links
+
+# Same order as os.walk(top) topdown, dirs can be pruned in place by the caller.
+# With threads, subfolders are listed ahead while the caller handles the current one
+def walk(top, threads=1):
+    pool = ThreadPoolExecutor(max_workers=threads) if threads > 1 else None
+    def listing(path):
+        return pool.submit(scan_dir, path) if pool else path
+
+    try:
+        stack = [(top, listing(top))]
+        while stack:
+            root, pending = stack.pop()
+            try:
+                dirs, files, sizes, links = pending.result() if pool else scan_dir(pending)
+            except OSError:
+                continue
+            yield root, dirs, files, sizes
+            children = [(os.path.join(root, d), listing(os.path.join(root, d))) for d in dirs if d not in links]
+            stack.extend(reversed(children))
+    finally:
+        if pool:
+            pool.shutdown(cancel_futures=True)
+
+# None for a regular text file, otherwise the reason to skip it:
+# oversized, generated (minified bundles, very long lines), binary (NUL bytes), encoding (not utf-8)
+def classify_file(file_path, size):
+    if size > max_file_size():
+        return "oversized"
+    if file_path.lower().endswith(GENERATED_SUFFIXES):
+        return "generated"
+    if size == 0:
+        return None
+    try:
+        with open(file_path, "rb") as f:
+            block = f.read(SNIFF_BYTES)
+    except OSError:
+        return "unreadable"
+    if b"\0" in block:
+        return "binary"
+    try:
+        # the block can end in the middle of a character
+        codecs.getincrementaldecoder("utf-8")().decode(block, final=len(block) == size)
+    except UnicodeDecodeError:
+        return "encoding"
+    if max(len(line) for line in block.split(b"\n")) > max_line_length():
+        return "generated"
+    return None
+
+# reasons for file_paths in the same order
+def classify_files(file_paths, sizes, threads=1):
+    if threads > 1:
+        with ThreadPoolExecutor(max_workers=threads) as pool:
+            return list(pool.map(classify_file, file_paths, sizes))
+    return [classify_file(file_path, size) for file_path, size in zip(file_paths, sizes)]
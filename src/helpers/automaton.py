@@ -0,0 +1,52 @@
+# Aho-Corasick automaton: all patterns found in a text in one pass over it,
+# instead of an `in` check per pattern. Values of the found patterns are returned,
+# the same as {value for pattern, value in patterns if pattern in text}
+from collections import deque
+
+class AhoCorasick:
+    def __init__(self, patterns):
+        self.goto = [{}]
+        self.fail = [0]
+        self.out = [set()]
+        # "" is in every text
+        self.always = set()
+        for pattern, value in patterns:
+            if not pattern:
+                self.always.add(value)
+                continue
+            node = 0
+            for ch in pattern:
+                nxt = self.goto[node].get(ch)
+                if nxt is None:
+                    nxt = len(self.goto)
+                    self.goto[node][ch] = nxt
+                    self.goto.append({})
+                    self.fail.append(0)
+                    self.out.append(set())
+                node = nxt
+            self.out[node].add(value)
+
+        # fail link: the node of the longest proper suffix which is also a prefix of some pattern,
+        # the root for the first characters
+        queue = deque(self.goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for ch, child in self.goto[node].items():
+                f = self.fail[node]
+                while f and ch not in self.goto[f]:
+                    f = self.fail[f]
+                self.fail[child] = self.goto[f].get(ch, 0)
+                self.out[child] |= self.out[self.fail[child]]
+                queue.append(child)
+
+    def find(self, text):
+        found = set(self.always)
+        goto, fail, out = self.goto, self.fail, self.out
+        node = 0
+        for ch in text:
+            while node and ch not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(ch, 0)
+            if out[node]:
+                found |= out[node]
+        return found
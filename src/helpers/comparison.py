@@ -1,31 +1,118 @@
 import numpy as np
 import os
+import atexit
+import threading
+from functools import lru_cache
+from collections import OrderedDict
 from fuzzywuzzy import fuzz
 import re
-from sentence_transformers import SentenceTransformer
-from transformers import AutoTokenizer, AutoModel
-from sklearn.metrics.pairwise import cosine_similarity
-from sklearn.metrics import jaccard_score
-from sklearn.feature_extraction.text import CountVectorizer
+from src.helpers.embedding_cache import EmbeddingStore
+from src.helpers.embedding_service import EmbeddingService
+from src.core.metrics import metrics
+from src.helpers.embedding_backend import load_model, embedding_backend, embedding_threads, backend_key, onnx_file
+try:
+    # computes whole score matrices in C, the per-pair loop is kept for installs without it
+    from rapidfuzz import process as rf_process, fuzz as rf_fuzz, utils as rf_utils
+except ImportError:
+    rf_process = None
 
 embedding_model = None
+embedding_store = None
+embedding_service = None
+store_lock = threading.Lock()
 
-# lazy load not to load the tool with no need
+def model_name():
+    return os.getenv("EMBEDDING_MODEL", "BAAI/bge-m3")
+
+# lazy load not to load the tool with no need, importing sentence_transformers (torch) takes seconds too.
+# EMBEDDING_BACKEND picks how it runs, see src/helpers/embedding_backend.py
 def model_singleton():
-    model_name = os.getenv("EMBEDDING_MODEL", "BAAI/bge-m3")
     global embedding_model
     if embedding_model:
         return embedding_model
     #embedding_model = SentenceTransformer("sentence-transformers/paraphrase-MiniLM-L6-v2")
-    embedding_model = SentenceTransformer(model_name) # best relevance
+    embedding_model = load_model(model_name(), embedding_backend(), embedding_threads()) # best relevance
     return embedding_model
 
-cache1 = None
-cache2 = None
+# on-disk embeddings, shared between runs. EMBEDDING_CACHE=no disables it
+def store_singleton():
+    global embedding_store
+    if os.getenv("EMBEDDING_CACHE") == "no":
+        return None
+    key = backend_key(model_name(), embedding_backend(), onnx_file())
+    if embedding_store is None or embedding_store.model_name != key:
+        if embedding_store:
+            embedding_store.flush()
+        embedding_store = EmbeddingStore(key)
+        atexit.register(embedding_store.flush)
+    return embedding_store
+
+def embedding_batch_size():
+    return int(os.getenv("EMBEDDING_BATCH_SIZE", "64"))
+
+def model_encode(texts):
+    return model_singleton().encode(texts, batch_size=embedding_batch_size())
+
+# Callers from several threads (or processes, see ProcessBridge) share one model through the service,
+# which batches their requests together. Without it the model is called in place
+def start_embedding_service():
+    global embedding_service
+    if embedding_service is None:
+        embedding_service = EmbeddingService(model_encode, max_batch=embedding_batch_size())
+    return embedding_service
+
+def use_embedding_service(service):
+    global embedding_service
+    embedding_service = service
+
+def flush_embeddings_cache():
+    if embedding_store:
+        with store_lock:
+            embedding_store.flush()
 
-cache = {}
+def memory_cache_limit_bytes():
+    return int(float(os.getenv("EMBEDDING_MEMORY_MB", "256")) * 1024 * 1024)
+
+# Vectors of this run by text. Least recently used ones are dropped above max_bytes,
+# they are still found in the embeddings store
+class VectorCache:
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.items = OrderedDict()
+        self.size = 0
+        self.lock = threading.Lock()
+
+    def get(self, text):
+        with self.lock:
+            vector = self.items.get(text)
+            if vector is not None:
+                self.items.move_to_end(text)
+            return vector
+
+    def put(self, text, vector):
+        with self.lock:
+            if text in self.items:
+                self.items.move_to_end(text)
+                return
+            self.items[text] = vector
+            self.size += vector.nbytes
+            while self.size > self.max_bytes:
+                _, old = self.items.popitem(last=False)
+                self.size -= old.nbytes
+
+    def clear(self):
+        with self.lock:
+            self.items.clear()
+            self.size = 0
+
+cache = VectorCache(memory_cache_limit_bytes())
 
 def fuzzy_score_lists(chunks1, chunks2):
+    metrics.count("pairs_compared", len(chunks1) * len(chunks2))
+    with metrics.phase("scoring"):
+        return best_fuzzy_pair(chunks1, chunks2)
+
+def best_fuzzy_pair(chunks1, chunks2):
     max_score = -1
     best_pair = (-1, -1)
     
@@ -39,35 +126,30 @@ def fuzzy_score_lists(chunks1, chunks2):
     return best_pair, max_score
 
 def longest_common_substring_score(a, b):
-    a, b = a.lower(), b.lower()
+    return lcs_score(a.lower(), b.lower())
+
+# the same YAML keys and README headings are compared again and again across pairs
+@lru_cache(maxsize=65536)
+def lcs_score(a, b):
     m, n = len(a), len(b)
     if m == 0 or n == 0:
         return 0.0
 
-    dp = [[0]*(n+1) for _ in range(m+1)]
-    max_len = 0
-    i_of_max = 0
-    j_of_max = 0
-
-    # Fill DP table
-    for i in range(m):
-        for j in range(n):
-            if a[i] == b[j]:
-                dp[i+1][j+1] = dp[i][j] + 1
-                if dp[i+1][j+1] > max_len:
-                    max_len = dp[i+1][j+1]
-                    i_of_max = i
-                    j_of_max = j
+    max_len = longest_common_substring_length(a, b)
+    if max_len == 0:
+        return 0.0
 
-    length_score = max_len / min(m, n)
+    # Earliest start of the matched substring in a, then in b.
+    # The same match as the first maximum of the full DP table
+    start_j = -1
+    for start_i in range(m - max_len + 1):
+        start_j = b.find(a[start_i:start_i + max_len])
+        if start_j != -1:
+            break
 
-    # Earliest start index of the matched substring in both strings
-    start_i = i_of_max + 1 - max_len
-    start_j = j_of_max + 1 - max_len
+    length_score = max_len / min(m, n)
 
     # Position factor: the closer to the front, the higher the score
-    # This simple formula penalizes matches that start further along in the string
-    position_factor = 1.0 - ((start_i/m + start_j/n) / 2)
     # Stronger penalty for being far from the start
     # The substring can't start any later than n - max_len
     denom = (n - max_len + 1) if (n - max_len + 1) else 1
@@ -76,6 +158,55 @@ def longest_common_substring_score(a, b):
 
     return length_score * position_factor
 
+# Suffix automaton of the shorter string (m chars, s of them distinct), the longer one (n chars) is walked over it.
+# Building is O(m * s) in the worst case, as cloned states copy their transitions, the walk is O(n) amortized.
+# O(m * s) memory instead of the (m+1)x(n+1) DP table
+def longest_common_substring_length(a, b):
+    if len(a) > len(b):
+        a, b = b, a
+    link = [-1]
+    length = [0]
+    trans = [{}]
+    last = 0
+    for ch in a:
+        cur = len(length)
+        length.append(length[last] + 1)
+        link.append(0)
+        trans.append({})
+        p = last
+        while p != -1 and ch not in trans[p]:
+            trans[p][ch] = cur
+            p = link[p]
+        if p != -1:
+            q = trans[p][ch]
+            if length[p] + 1 == length[q]:
+                link[cur] = q
+            else:
+                clone = len(length)
+                length.append(length[p] + 1)
+                link.append(link[q])
+                trans.append(dict(trans[q]))
+                while p != -1 and trans[p].get(ch) == q:
+                    trans[p][ch] = clone
+                    p = link[p]
+                link[q] = clone
+                link[cur] = clone
+        last = cur
+
+    state = 0
+    cur_len = 0
+    max_len = 0
+    for ch in b:
+        while state and ch not in trans[state]:
+            state = link[state]
+            cur_len = length[state]
+        if ch in trans[state]:
+            state = trans[state][ch]
+            cur_len += 1
+        if cur_len > max_len:
+            max_len = cur_len
+    return max_len
+
 def normalize_string(txt):
     txt = txt.replace("_", " ")
     # If not upper case ENV_VAR style, split by camel case
@@ -113,7 +244,56 @@ def hybrid_score(str1, str2, cosine):
     )
     return base_score
 
+# fuzzywuzzy processing of token_set_ratio: ascii only, alphanumeric, lower case
+def fuzz_process(txt):
+    return rf_utils.default_process(txt.encode("ascii", "ignore").decode())
+
+def token_set_ratio_matrix(strs1, strs2):
+    if rf_process:
+        scores = rf_process.cdist(strs1, strs2, scorer=rf_fuzz.token_set_ratio, processor=fuzz_process, dtype=np.float64)
+        # fuzzywuzzy rounds to integers, and on exact halves its float error decides the direction.
+        # These rare cells are taken from fuzzywuzzy itself
+        for i, j in zip(*np.nonzero(np.abs(scores % 1 - 0.5) < 1e-6)):
+            scores[i, j] = fuzz.token_set_ratio(strs1[i], strs2[j])
+        return np.round(scores)
+    return np.array([[fuzz.token_set_ratio(a, b) for b in strs2] for a in strs1], dtype=np.float64).reshape(len(strs1), len(strs2))
+
+# Lexical part of hybrid_score for all pairs at once, every string is normalized only once.
+# Returns fuzz and longest common substring score matrices of shape (len(items1), len(items2))
+def lexical_score_matrices(items1, items2):
+    strs1 = [normalize_string(s) for s in items1]
+    strs2 = [normalize_string(s) for s in items2]
+    return normalized_lexical_matrices(strs1, strs2)
+
+def normalized_lexical_matrices(strs1, strs2):
+    fuzz_matrix = token_set_ratio_matrix(strs1, strs2) / 100
+    lcs_matrix = np.array([[longest_common_substring_score(a, b) for b in strs2] for a in strs1], dtype=np.float64).reshape(len(strs1), len(strs2))
+    return fuzz_matrix, lcs_matrix
+
+# hybrid_score of every pair as array arithmetic over the cosine matrix
+def hybrid_score_matrix(items1, items2, cosine):
+    metrics.count("pairs_compared", len(items1) * len(items2))
+    with metrics.phase("scoring"):
+        return hybrid_scores(items1, items2, cosine)
+
+def hybrid_scores(items1, items2, cosine):
+    strs1 = [normalize_string(s) for s in items1]
+    strs2 = [normalize_string(s) for s in items2]
+    fuzz_matrix, lcs_matrix = normalized_lexical_matrices(strs1, strs2)
+
+    lens1 = np.array([len(s) for s in strs1])
+    lens2 = np.array([len(s) for s in strs2])
+    is_short = (lens1[:, None] < 20) | (lens2[None, :] < 20)
+    # same weights as in hybrid_score
+    fuzz_weights = np.where(is_short, 0.4, 0.2)
+    cosine_weights = np.where(is_short, 0.1, 0.6)
+    lcs_weights = np.where(is_short, 0.5, 0.2)
+
+    return np.clip(fuzz_matrix * fuzz_weights + np.asarray(cosine) * cosine_weights + lcs_matrix * lcs_weights, 0, 1)
+
 def jaccard(text1, text2):
+    from sklearn.metrics import jaccard_score
+    from sklearn.feature_extraction.text import CountVectorizer
     vectorizer = CountVectorizer(binary=True).fit([text1, text2])
     vectors = vectorizer.transform([text1, text2])
     return jaccard_score(vectors[0].toarray()[0], vectors[1].toarray()[0])
@@ -127,46 +307,136 @@ def map_texts_fuzz(chunks1, chunks2):
         res.append(c2res)
     return res
 
-def map_texts_cosine_with_cache(chunks1, chunks2):
-    model = model_singleton()
-    h1 = str(hash("".join(chunks1)))
-    h2 = str(hash("".join(chunks2)))
-    
-    emb2 = model.encode(chunks2)
-    if h1 in cache:
-        emb1 = cache[h1]
-    else:
-        emb1 = model.encode(chunks1)
-        cache[h1] = emb1
-    if h2 in cache:
-        emb2 = cache[h2]
-    else:
-        emb2 = model.encode(chunks2)
-        cache[h2] = emb2
+# Embeddings for texts in the same order. Every distinct string is looked up
+# in memory, then on disk, and only the rest goes to the model in one call
+def encode_texts(texts):
+    with metrics.phase("embedding"):
+        vectors = {}
+        missing = []
+        for text in dict.fromkeys(texts):
+            vector = cache.get(text)
+            if vector is not None:
+                vectors[text] = vector
+            else:
+                missing.append(text)
+
+        store = store_singleton()
+        if store and missing:
+            with store_lock:
+                vectors.update(store.lookup(missing))
+            missing = [text for text in missing if text not in vectors]
+
+        metrics.count("embedding_cache_hits", len(vectors))
+        if missing:
+            metrics.count("strings_encoded", len(missing))
+            if embedding_service:
+                embs = embedding_service.submit(missing).result()
+            else:
+                embs = model_encode(missing)
+            vectors.update(zip(missing, embs))
+            if store:
+                with store_lock:
+                    store.add(missing, embs)
+
+        for text, vector in vectors.items():
+            cache.put(text, np.asarray(vector))
+        return np.array([vectors[text] for text in texts])
 
+# same as sklearn cosine_similarity, zero vectors are similar to nothing
+def cosine_similarity(emb1, emb2):
+    emb1 = np.asarray(emb1, dtype=np.float64)
+    emb2 = np.asarray(emb2, dtype=np.float64)
+    norms1 = np.linalg.norm(emb1, axis=1, keepdims=True)
+    norms2 = np.linalg.norm(emb2, axis=1, keepdims=True)
+    norms1[norms1 == 0] = 1
+    norms2[norms2 == 0] = 1
+    return (emb1 / norms1) @ (emb2 / norms2).T
+
+def map_texts_cosine_with_cache(chunks1, chunks2):
+    if not chunks1 or not chunks2:
+        return np.zeros((len(chunks1), len(chunks2)))
+    emb1 = encode_texts(chunks1)
+    emb2 = encode_texts(chunks2)
     return cosine_similarity(emb1, emb2)
 
+# Embeddings of all strings known upfront, encoded in one pass.
+# Cosine matrices of any two sublists are sliced out of it instead of calling the model per pair
+class EmbeddingMatrix:
+    def __init__(self, texts):
+        self.rows = {text: i for i, text in enumerate(dict.fromkeys(texts))}
+        embs = encode_texts(list(self.rows)) if self.rows else np.zeros((0, 0))
+        norms = np.linalg.norm(embs, axis=1, keepdims=True)
+        norms[norms == 0] = 1
+        self.normalized = embs / norms
+
+    def __contains__(self, text):
+        return text in self.rows
+
+    def cosine(self, texts1, texts2):
+        if not texts1 or not texts2:
+            return np.zeros((len(texts1), len(texts2)))
+        if not all(t in self.rows for t in texts1) or not all(t in self.rows for t in texts2):
+            return map_texts_cosine_with_cache(texts1, texts2)
+        emb1 = self.normalized[[self.rows[t] for t in texts1]]
+        emb2 = self.normalized[[self.rows[t] for t in texts2]]
+        return emb1 @ emb2.T
+
+    # normalized mean embedding of known texts, zeros if none of them is known
+    def mean(self, texts):
+        rows = [self.rows[t] for t in texts if t in self.rows]
+        if not rows:
+            return np.zeros(self.normalized.shape[1])
+        mean = self.normalized[rows].mean(axis=0)
+        norm = np.linalg.norm(mean)
+        return mean / norm if norm else mean
+
+# Indices of top_k most similar rows of sigs2 for every row of sigs1, by dot product.
+# Pairs where mask is False are never returned. Indices of each row are sorted ascending
+# mask(start, stop) - which pairs of rows start:stop of sigs1 with all of sigs2 may be neighbours,
+# built per block, so no len(sigs1) x len(sigs2) array is ever held
+def top_k_neighbours(sigs1, sigs2, top_k, mask=None, block_size=1024):
+    res = []
+    top_k = min(top_k, len(sigs2))
+    if top_k <= 0:
+        return [[] for _ in range(len(sigs1))]
+    for start in range(0, len(sigs1), block_size):
+        scores = sigs1[start:start + block_size] @ sigs2.T
+        if mask is not None:
+            block_mask = mask(start, min(start + block_size, len(sigs1)))
+            scores = np.where(block_mask, scores, -np.inf)
+        best = np.argpartition(-scores, top_k - 1, axis=1)[:, :top_k]
+        for i, row in enumerate(best):
+            res.append(sorted(int(j) for j in row if scores[i, j] != -np.inf))
+    return res
+
+def clean_items(items):
+    return [str(item) for item in items if str(item).strip() != ""]
+
 
 # compares two lists of strings. many to many.
 # for each item on left calculates max hybrid score on the right
 # keeps matched_rights dict with indices to restore matches
-def hybrid_strings_lists_comparison(items1, items2, threshold=0.6):
+# embeddings - optional EmbeddingMatrix with items of both lists already encoded
+def hybrid_strings_lists_comparison(items1, items2, threshold=0.6, embeddings=None):
     total_scores = []
-    items1 = [str(item) for item in items1 if str(item).strip() != ""]
-    items2 = [str(item) for item in items2 if str(item).strip() != ""]
+    items1 = clean_items(items1)
+    items2 = clean_items(items2)
     
-    matrix = map_texts_cosine_with_cache(items1, items2)
+    if embeddings is not None:
+        matrix = embeddings.cosine(items1, items2)
+    else:
+        matrix = map_texts_cosine_with_cache(items1, items2)
+    rats = hybrid_score_matrix(items1, items2, matrix)
     i2s_already_matched_with_i1s = []
     matched_rights = {}
-    for i1, items in enumerate(matrix):
+    for i1, items in enumerate(rats):
         scores = []
         mx = 0
         mx_right_i = -1
-        for i2, cosine in enumerate(items):
+        for i2, rat in enumerate(items):
             # avoid duplicates in the left column
             if i2 in i2s_already_matched_with_i1s:
                 continue
-            rat = hybrid_score(items1[i1], items2[i2], cosine)
             #print(rat, items1[i1], items2[i2])
             if rat > threshold and rat > mx:
                 mx = rat
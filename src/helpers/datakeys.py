@@ -0,0 +1,244 @@
+# Key groups of YAML and JSON files without building the documents.
+# Gives the same groups as collecting keys of every mapping of a loaded document (see collect_yaml_keys):
+# keys of one mapping, its parent is the key it's under, or the file folder for the top one.
+# Mappings inside lists are not collected.
+# YAML goes through parser events (the libyaml C parser if available), all documents of a stream are read.
+# JSON is walked by a tokenizer which skips values and everything below the depth limit (see JSONKeysWalker)
+import os
+import re
+import sys
+import json
+import yaml
+
+EventsLoader = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+
+def max_depth():
+    return int(os.getenv("DATA_MAX_DEPTH", "20"))
+
+def max_size():
+    return int(float(os.getenv("DATA_MAX_SIZE_KB", "1024")) * 1024)
+
+def unknown_tag_handler(loader, tag_suffix, node):
+    return 'unknownyamltag'
+
+class KeyConstructor(yaml.constructor.SafeConstructor):
+    pass
+
+KeyConstructor.add_multi_constructor('', unknown_tag_handler)
+
+resolver = yaml.resolver.Resolver()
+key_constructor = KeyConstructor()
+MERGE_TAG = "tag:yaml.org,2002:merge"
+MERGE_KEY = "<<"
+
+def scalar_tag(event):
+    if event.tag is None or event.tag == "!":
+        return resolver.resolve(yaml.ScalarNode, event.value, event.implicit)
+    return event.tag
+
+# python value of a scalar, the same as the safe loader gives: 1 -> int, true -> bool, ~ -> None
+def scalar_value(event):
+    node = yaml.ScalarNode(scalar_tag(event), event.value, style=event.style)
+    try:
+        return key_constructor.construct_object(node)
+    finally:
+        key_constructor.constructed_objects.clear()
+
+class MappingFrame:
+    def __init__(self, parent, anchor, slot, merge):
+        self.parent = parent
+        self.anchor = anchor
+        self.slot = slot # index of this mapping keys in groups, keeps keys before nested ones
+        self.merge = merge # mapping is a value of "<<", its keys go to the parent mapping
+        self.keys = []
+        self.merged = []
+        self.key = None
+        self.expect_key = True
+        self.groups_start = 0
+
+class IgnoredFrame:
+    # sequences, mappings inside them, complex keys, and everything deeper than max depth
+    def __init__(self, kind):
+        self.kind = kind
+        self.is_key = False
+
+def yaml_key_groups(stream, root, type="YAML", depth_limit=None):
+    depth_limit = depth_limit or max_depth()
+    groups = []
+    done = 0
+    anchors = {} # anchor -> (keys, nested groups)
+    stack = []
+
+    # a node in the top mapping is over, after a value goes a key, after a (complex) key goes a value
+    def node_done(frame=None):
+        if stack and isinstance(stack[-1], MappingFrame):
+            stack[-1].expect_key = not (frame and frame.is_key)
+
+    def ignore(kind):
+        frame = IgnoredFrame(kind)
+        frame.is_key = isinstance(stack[-1], MappingFrame) and stack[-1].expect_key if stack else False
+        stack.append(frame)
+
+    # top is the list of mappings to merge: <<: [...]
+    def in_merge_list():
+        return len(stack) > 1 and isinstance(stack[-1], IgnoredFrame) and stack[-1].kind == "sequence" \
+            and isinstance(stack[-2], MappingFrame) and stack[-2].key is MERGE_KEY and not stack[-2].expect_key
+
+    try:
+        for event in yaml.parse(stream, Loader=EventsLoader):
+            top = stack[-1] if stack else None
+            if isinstance(event, yaml.DocumentEndEvent):
+                done = len(groups)
+            elif isinstance(event, yaml.MappingStartEvent):
+                merge = (isinstance(top, MappingFrame) and top.key is MERGE_KEY and not top.expect_key) or in_merge_list()
+                if not merge and (isinstance(top, IgnoredFrame) or (isinstance(top, MappingFrame) and top.expect_key)):
+                    ignore("mapping")
+                    continue
+                depth = len([f for f in stack if isinstance(f, MappingFrame)])
+                if depth >= depth_limit:
+                    ignore("mapping")
+                    continue
+                frame = MappingFrame(top.key if isinstance(top, MappingFrame) else root, event.anchor, len(groups), merge)
+                if not merge:
+                    groups.append(None)
+                frame.groups_start = len(groups)
+                stack.append(frame)
+            elif isinstance(event, yaml.MappingEndEvent):
+                frame = stack.pop()
+                if isinstance(frame, IgnoredFrame):
+                    node_done(frame)
+                    continue
+                own = frame.keys
+                keys = list(dict.fromkeys(frame.merged + own))
+                if frame.merge and isinstance(stack[-1], IgnoredFrame):
+                    # <<: [*a, {...}], keys of later mappings come first as in the safe loader
+                    stack[-2].merged = keys + stack[-2].merged
+                elif frame.merge:
+                    stack[-1].merged += keys
+                else:
+                    groups[frame.slot] = (type, frame.parent, keys) if keys else None
+                if frame.anchor:
+                    anchors[frame.anchor] = (keys, groups[frame.groups_start:])
+                node_done()
+            elif isinstance(event, yaml.SequenceStartEvent):
+                ignore("sequence")
+            elif isinstance(event, yaml.SequenceEndEvent):
+                node_done(stack.pop())
+            elif isinstance(event, yaml.ScalarEvent):
+                if isinstance(top, MappingFrame):
+                    if top.expect_key:
+                        if scalar_tag(event) == MERGE_TAG:
+                            top.key = MERGE_KEY
+                        else:
+                            top.key = scalar_value(event)
+                            top.keys.append(top.key)
+                        top.expect_key = False
+                    else:
+                        top.expect_key = True
+            elif isinstance(event, yaml.AliasEvent):
+                if isinstance(top, MappingFrame) and not top.expect_key:
+                    if event.anchor in anchors:
+                        keys, nested = anchors[event.anchor]
+                        if top.key is MERGE_KEY:
+                            top.merged += keys
+                        elif keys:
+                            groups.append((type, top.key, keys))
+                        groups += nested
+                    top.expect_key = True
+                elif in_merge_list():
+                    if event.anchor in anchors:
+                        stack[-2].merged = anchors[event.anchor][0] + stack[-2].merged
+                        groups += anchors[event.anchor][1]
+    except Exception as e:
+        print(e, file=sys.stderr)
+        # documents before the broken one are still good
+        groups = groups[:done]
+    return [g for g in groups if g]
+
+JSON_SPACE = re.compile(r"[ \t\n\r]*")
+JSON_STRING = re.compile(r'"(?:[^"\\\x00-\x1f]|\\.)*"')
+JSON_SCALAR = re.compile(r"-?(?:0|[1-9][0-9]*)(?:\.[0-9]+)?(?:[eE][+-]?[0-9]+)?|true|false|null")
+# strings and brackets, enough to find where a skipped value ends
+JSON_SKIP = re.compile(r'"(?:[^"\\]|\\.)*"|[\[\]{}]')
+
+# JSON is walked without decoding values: objects above depth_limit give their keys,
+# lists and everything deeper are skipped by matching brackets only, so they are not checked as strictly
+# as by json.load, and nesting of any depth doesn't hit the recursion limit
+class JSONKeysWalker:
+    def __init__(self, text, type, depth_limit):
+        self.text = text
+        self.type = type
+        self.depth_limit = depth_limit
+
+    def space(self, pos):
+        return JSON_SPACE.match(self.text, pos).end()
+
+    def expect(self, pos, char):
+        pos = self.space(pos)
+        if not self.text.startswith(char, pos):
+            raise ValueError(f"JSON: expected {char!r} at {pos}")
+        return pos + 1
+
+    # end of the list or object at pos
+    def skip_nested(self, pos):
+        closing = []
+        for m in JSON_SKIP.finditer(self.text, pos):
+            token = m.group()
+            if token == "[" or token == "{":
+                closing.append("]" if token == "[" else "}")
+            elif token == "]" or token == "}":
+                if closing.pop() != token:
+                    raise ValueError(f"JSON: unexpected {token!r} at {m.start()}")
+                if not closing:
+                    return m.end()
+        raise ValueError("JSON: unexpected end")
+
+    # end of the value at pos and groups of its objects, None if it's not an object
+    def value(self, pos, parent, depth):
+        pos = self.space(pos)
+        char = self.text[pos:pos + 1]
+        if char == "{":
+            if depth >= self.depth_limit:
+                return self.skip_nested(pos), []
+            return self.object(pos, parent, depth)
+        if char == "[":
+            return self.skip_nested(pos), None
+        m = (JSON_STRING if char == '"' else JSON_SCALAR).match(self.text, pos)
+        if not m:
+            raise ValueError(f"JSON: unexpected value at {pos}")
+        return m.end(), None
+
+    def object(self, pos, parent, depth):
+        # key -> groups of its value, a repeated key keeps its first place and its last value, as in a dict
+        children = {}
+        pos = self.space(pos + 1)
+        if self.text.startswith("}", pos):
+            return pos + 1, []
+        while True:
+            pos = self.space(pos)
+            m = JSON_STRING.match(self.text, pos)
+            if not m:
+                raise ValueError(f"JSON: expected a key at {pos}")
+            key = m.group()
+            key = json.loads(key) if "\\" in key else key[1:-1]
+            pos, children[key] = self.value(self.expect(m.end(), ":"), key, depth + 1)
+            pos = self.space(pos)
+            if self.text.startswith("}", pos):
+                break
+            pos = self.expect(pos, ",")
+        groups = [(self.type, parent, list(children))]
+        for child in children.values():
+            groups += child or []
+        return pos + 1, groups
+
+def json_key_groups(stream, root, type="JSON", depth_limit=None):
+    depth_limit = depth_limit or max_depth()
+    walker = JSONKeysWalker(stream.read(), type, depth_limit)
+    try:
+        pos, groups = walker.value(0, root, 0)
+        if walker.space(pos) != len(walker.text):
+            raise ValueError(f"JSON: extra data at {pos}")
+    except ValueError as e:
+        print(e, file=sys.stderr)
+        return []
+    return groups or []
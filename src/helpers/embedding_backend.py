@@ -0,0 +1,63 @@
+# How the embedding model runs, EMBEDDING_BACKEND:
+# - torch (default): the sentence-transformers model as is
+# - onnx: the model exported to ONNX and run by onnxruntime (needs sentence-transformers[onnx]),
+#   EMBEDDING_ONNX_FILE picks an already exported file of the model repo, e.g. onnx/model_qint8_avx512.onnx
+# - int8: torch model with Linear layers dynamically quantized to int8, no extra dependencies
+# int8 and onnx give slightly different vectors, so they are cached apart from the reference ones
+import os
+import hashlib
+
+BACKENDS = ("torch", "onnx", "int8")
+
+def embedding_backend():
+    backend = os.getenv("EMBEDDING_BACKEND", "torch")
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown EMBEDDING_BACKEND {backend}, expected one of {', '.join(BACKENDS)}")
+    return backend
+
+# 0 leaves the default of the runtime (number of cores)
+def embedding_threads():
+    return int(os.getenv("EMBEDDING_THREADS", "0"))
+
+def onnx_file():
+    return os.getenv("EMBEDDING_ONNX_FILE")
+
+def file_digest(file_path):
+    h = hashlib.sha1()
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()[:12]
+
+# Name of the vectors in the embeddings cache. Every ONNX file is another model: the file name,
+# and the digest of its content when the model is a local folder
+def backend_key(model_name, backend, onnx_file_name=None):
+    if backend == "torch":
+        return model_name
+    if backend == "onnx" and onnx_file_name:
+        local_path = os.path.join(model_name, onnx_file_name)
+        if os.path.isfile(local_path):
+            return f"{model_name}@onnx:{onnx_file_name}:{file_digest(local_path)}"
+        return f"{model_name}@onnx:{onnx_file_name}"
+    return f"{model_name}@{backend}"
+
+def load_model(model_name, backend="torch", threads=0):
+    from sentence_transformers import SentenceTransformer
+    if backend == "onnx":
+        model_kwargs = {}
+        if onnx_file():
+            model_kwargs["file_name"] = onnx_file()
+        if threads:
+            import onnxruntime
+            options = onnxruntime.SessionOptions()
+            options.intra_op_num_threads = threads
+            model_kwargs["session_options"] = options
+        return SentenceTransformer(model_name, backend="onnx", model_kwargs=model_kwargs)
+
+    import torch
+    if threads:
+        torch.set_num_threads(threads)
+    model = SentenceTransformer(model_name, device="cpu" if backend == "int8" else None)
+    if backend == "int8":
+        model = torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+    return model
@@ -0,0 +1,202 @@
+# Persistent embeddings store. One row per string, keyed by a stable digest of
+# the model name and the text, so the same README chunks and YAML keys are not
+# encoded again on the next run over an unchanged project.
+# Vectors live in a memory-mapped .npy file, the index next to it in json.
+# Processes sharing the cache (fleet workers) load and write it under a file lock.
+import os
+import re
+import sys
+import json
+import hashlib
+from contextlib import contextmanager
+import numpy as np
+try:
+    import fcntl
+except ImportError:
+    # Windows
+    fcntl = None
+    import msvcrt
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "doctor", "embeddings")
+INDEX_FILE = "index.json"
+LOCK_FILE = "lock"
+
+# exclusive lock of the cache folder between processes
+@contextmanager
+def folder_lock(path):
+    os.makedirs(path, exist_ok=True)
+    with open(os.path.join(path, LOCK_FILE), "a+") as f:
+        if fcntl:
+            fcntl.flock(f, fcntl.LOCK_EX)
+        else:
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+        try:
+            yield
+        finally:
+            if fcntl:
+                fcntl.flock(f, fcntl.LOCK_UN)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+def text_digest(model_name, text):
+    return hashlib.sha1((model_name + "\0" + text).encode("utf-8")).hexdigest()
+
+def cache_limit_bytes():
+    return int(float(os.getenv("EMBEDDING_CACHE_MB", "512")) * 1024 * 1024)
+
+class EmbeddingStore:
+    def __init__(self, model_name, cache_dir=None, max_bytes=None):
+        self.model_name = model_name
+        base_dir = cache_dir or os.getenv("EMBEDDING_CACHE_DIR", DEFAULT_CACHE_DIR)
+        self.path = os.path.join(base_dir, re.sub(r"[^A-Za-z0-9_.-]", "_", model_name))
+        self.max_bytes = max_bytes if max_bytes is not None else cache_limit_bytes()
+        self.index = {} # digest -> [row, last used]
+        self.pending = {} # digest -> vector, not yet written to disk
+        self.vectors = None
+        self.vectors_file = None
+        self.clock = 0
+        # new rows to write with the vectors file
+        self.dirty = False
+        # only the recency of known rows changed, the small index is enough to write
+        self.touched = False
+        self.hits = 0
+        self.load()
+
+    def load(self):
+        index_path = os.path.join(self.path, INDEX_FILE)
+        if not os.path.exists(index_path):
+            return
+        with folder_lock(self.path):
+            self.load_unlocked(index_path)
+
+    def load_unlocked(self, index_path):
+        try:
+            with open(index_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            vectors = np.load(os.path.join(self.path, data["vectors"]), mmap_mode="r")
+        except Exception as e:
+            # broken or concurrently replaced cache, start from scratch
+            print(f"Embedding cache is not readable, ignoring it: {e}", file=sys.stderr)
+            return
+        self.vectors = vectors
+        self.vectors_file = data["vectors"]
+        self.index = data["keys"]
+        self.clock = data["clock"]
+
+    def lookup(self, texts):
+        self.clock += 1
+        found = {}
+        for text in texts:
+            digest = text_digest(self.model_name, text)
+            if digest in self.pending:
+                found[text] = self.pending[digest]
+            elif digest in self.index:
+                entry = self.index[digest]
+                entry[1] = self.clock
+                # copy, so no view keeps the mapping open after a flush
+                found[text] = np.array(self.vectors[entry[0]])
+        if found:
+            self.hits += len(found)
+            self.touched = True
+        return found
+
+    def add(self, texts, vectors):
+        for text, vector in zip(texts, vectors):
+            self.pending[text_digest(self.model_name, text)] = np.asarray(vector, dtype=np.float32)
+        self.dirty = True
+
+    # generation written by another process since this one was loaded, its rows are kept on flush
+    def concurrent_generation(self):
+        try:
+            with open(os.path.join(self.path, INDEX_FILE), "r", encoding="utf-8") as f:
+                data = json.load(f)
+            if data["vectors"] == self.vectors_file:
+                return None
+            return data, np.load(os.path.join(self.path, data["vectors"]), mmap_mode="r")
+        except Exception:
+            return None
+
+    # Last used marks of the rows into the current index, the vectors file stays as is.
+    # Another generation written meanwhile keeps its rows, marks of the rows it shares with this one are updated
+    def flush_recency(self):
+        with folder_lock(self.path):
+            self.flush_recency_unlocked()
+
+    def flush_recency_unlocked(self):
+        index_path = os.path.join(self.path, INDEX_FILE)
+        try:
+            with open(index_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except Exception:
+            return
+        for digest, entry in data["keys"].items():
+            if digest in self.index:
+                entry[1] = max(entry[1], self.index[digest][1])
+        data["clock"] = max(data["clock"], self.clock)
+        index_tmp = index_path + f".{os.getpid()}.tmp"
+        with open(index_tmp, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+        os.replace(index_tmp, index_path)
+        self.touched = False
+
+    # Writes a new generation of the vectors file, most recently used rows first.
+    # Rows which don't fit into max_bytes are evicted
+    def flush(self):
+        if not self.dirty:
+            if self.touched:
+                self.flush_recency()
+            return
+        with folder_lock(self.path):
+            self.flush_unlocked()
+
+    def flush_unlocked(self):
+        self.clock += 1
+        entries = [(digest, entry[1], self.vectors, entry[0]) for digest, entry in self.index.items() if digest not in self.pending]
+        entries += [(digest, self.clock, None, None) for digest in self.pending]
+        other = self.concurrent_generation()
+        if other:
+            data, other_vectors = other
+            known = set(self.index) | set(self.pending)
+            entries += [(digest, entry[1], other_vectors, entry[0]) for digest, entry in data["keys"].items() if digest not in known]
+            self.clock = max(self.clock, data["clock"] + 1)
+        if not entries:
+            return
+        dim = len(next(iter(self.pending.values()))) if self.pending else entries[0][2].shape[1]
+        entries.sort(key=lambda e: e[1], reverse=True)
+        entries = entries[:self.max_bytes // (dim * 4)]
+        if not entries:
+            return
+
+        os.makedirs(self.path, exist_ok=True)
+        generation = f"vectors-{os.getpid()}-{self.clock}.npy"
+        tmp_path = os.path.join(self.path, generation + ".tmp")
+        new_index = {}
+        out = np.lib.format.open_memmap(tmp_path, mode="w+", dtype=np.float32, shape=(len(entries), dim))
+        for row, (digest, last_used, source, old_row) in enumerate(entries):
+            out[row] = self.pending[digest] if source is None else source[old_row]
+            new_index[digest] = [row, last_used]
+        out.flush()
+        del out
+        os.replace(tmp_path, os.path.join(self.path, generation))
+
+        index_tmp = os.path.join(self.path, INDEX_FILE + ".tmp")
+        with open(index_tmp, "w", encoding="utf-8") as f:
+            json.dump({"vectors": generation, "keys": new_index, "clock": self.clock}, f)
+        os.replace(index_tmp, os.path.join(self.path, INDEX_FILE))
+
+        self.vectors = None
+        self.index = {}
+        self.pending = {}
+        self.dirty = False
+        self.touched = False
+        self.load_unlocked(os.path.join(self.path, INDEX_FILE))
+        # older generations and files left by killed processes, nobody else writes under the lock.
+        # Other processes keep reading their mapped generation, on Windows it can't be removed until they close it
+        for file in os.listdir(self.path):
+            if file.startswith("vectors-") and file != generation:
+                try:
+                    os.remove(os.path.join(self.path, file))
+                except OSError:
+                    pass
@@ -0,0 +1,138 @@
+# One model shared by concurrent callers. Requests from threads (use cases run side by side)
+# or from other processes (fleet workers, through ProcessBridge) are queued, and the worker thread
+# coalesces them into one model call of up to max_batch strings. A request waits for others
+# at most max_latency seconds, so a lone caller isn't slowed down much
+import os
+import time
+import queue
+import threading
+import multiprocessing
+from concurrent.futures import Future
+import numpy as np
+
+def max_latency():
+    return float(os.getenv("EMBEDDING_MAX_LATENCY_MS", "10")) / 1000
+
+class EmbeddingRequest:
+    def __init__(self, texts):
+        self.texts = texts
+        self.future = Future()
+
+class EmbeddingService:
+    def __init__(self, encode, max_batch=64, latency=None):
+        self.encode = encode
+        self.max_batch = max_batch
+        self.latency = max_latency() if latency is None else latency
+        self.requests = queue.Queue()
+        self.batches = 0
+        self.served = 0
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    # future of embeddings for texts in the same order
+    def submit(self, texts):
+        request = EmbeddingRequest(list(texts))
+        if not request.texts:
+            request.future.set_result(np.zeros((0, 0)))
+            return request.future
+        self.requests.put(request)
+        return request.future
+
+    def close(self):
+        self.requests.put(None)
+        self.thread.join()
+
+    def run(self):
+        closed = False
+        while not closed:
+            first = self.requests.get()
+            if first is None:
+                return
+            batch = [first]
+            size = len(first.texts)
+            deadline = time.monotonic() + self.latency
+            while size < self.max_batch:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    request = self.requests.get(timeout=timeout)
+                except queue.Empty:
+                    break
+                if request is None:
+                    closed = True
+                    break
+                batch.append(request)
+                size += len(request.texts)
+            self.run_batch(batch)
+
+    def run_batch(self, batch):
+        texts = list(dict.fromkeys(text for request in batch for text in request.texts))
+        try:
+            rows = dict(zip(texts, self.encode(texts)))
+        except Exception as e:
+            for request in batch:
+                request.future.set_exception(e)
+            return
+        self.batches += 1
+        self.served += len(batch)
+        for request in batch:
+            request.future.set_result(np.array([rows[text] for text in request.texts]))
+
+# Serves an EmbeddingService of this process to forked child processes.
+# Created before the fork with a reply queue per child, started with the service after it:
+# a thread waiting on a queue while the process forks leaves its lock taken in the child
+class ProcessBridge:
+    def __init__(self, clients):
+        context = multiprocessing.get_context("fork")
+        self.service = None
+        self.requests = context.Queue()
+        self.replies = [context.Queue() for _ in range(clients)]
+        self.slots = context.Queue()
+        for slot in range(clients):
+            self.slots.put(slot)
+        self.thread = None
+
+    def start(self, service):
+        self.service = service
+        self.thread = threading.Thread(target=self.serve, daemon=True)
+        self.thread.start()
+
+    def close(self):
+        if self.thread:
+            self.requests.put(None)
+            self.thread.join()
+
+    def serve(self):
+        while True:
+            item = self.requests.get()
+            if item is None:
+                return
+            slot, texts = item
+            future = self.service.submit(texts)
+            future.add_done_callback(lambda f, slot=slot:
+                self.replies[slot].put((f.exception(), None if f.exception() else f.result())))
+
+    # called once in every child process
+    def connect(self):
+        return RemoteEmbeddingService(self.requests, self.replies, self.slots.get())
+
+# Child side of ProcessBridge, the same submit() as EmbeddingService
+class RemoteEmbeddingService:
+    def __init__(self, requests, replies, slot):
+        self.requests = requests
+        self.reply = replies[slot]
+        self.slot = slot
+        self.lock = threading.Lock()
+
+    def submit(self, texts):
+        future = Future()
+        with self.lock:
+            # one request at a time per process, so the next reply is for it
+            self.requests.put((self.slot, list(texts)))
+            error, result = self.reply.get()
+        if error:
+            future.set_exception(error)
+        else:
+            future.set_result(result)
+        return future
@@ -1,15 +1,128 @@
 import os
+import re
+
+paths_exclusions = ["node_modules", "documentation", ".venv", "venv", "virtualenv", ".git", "schema", "build", "static", "CHANGELOG", "CREDITS", "LEGAL", "LICENSE", "MANIFEST", "dist/", "out/", "target/", "__pycache__", ".idea", ".vscode", ".DS_Store",
+".coverage", ".pytest_cache", "coverage.xml", "tmp",
+".gradle", ".next", ".nuxt", "coverage", "public", "env", ".env",
+".cache", "jspm_packages", "bower_components"]
+exclusions = ["README.md", "package-lock.json", "pdm.lock", "__init__"]
+
+# Substrings as one regex with common prefixes factored out, like a trie.
+# Matches the same paths as `any(s in path for s in substrings)`
+def trie_regex(substrings):
+    trie = {}
+    for s in substrings:
+        node = trie
+        for ch in s:
+            node = node.setdefault(ch, {})
+        node[""] = {}
+
+    def build(node):
+        if "" in node: # a substring ends here, longer ones are not needed
+            return ""
+        alts = [re.escape(ch) + build(child) for ch, child in sorted(node.items())]
+        return alts[0] if len(alts) == 1 else "(?:" + "|".join(alts) + ")"
+
+    return re.compile(build(trie))
+
+exclusion_matchers = {}
+
+def exclusion_matcher():
+    allow_tests = os.getenv("ALLOW_TEST_PATHS") == "yes"
+    if allow_tests not in exclusion_matchers:
+        exclusion_matchers[allow_tests] = trie_regex(paths_exclusions + ([] if allow_tests else ["test"]))
+    return exclusion_matchers[allow_tests]
 
 def is_file_to_skip(file_path):
     file = os.path.basename(file_path)
-    paths_exclusions = ["node_modules", "documentation", ".venv", "venv", "virtualenv", ".git", "schema", "build", "static", "CHANGELOG", "CREDITS", "LEGAL", "LICENSE", "MANIFEST", "dist/", "out/", "target/", "__pycache__", ".idea", ".vscode", ".DS_Store",
-    ".coverage", ".pytest_cache", "coverage.xml", "tmp",
-    ".gradle", ".next", ".nuxt", "coverage", "public", "env", ".env",
-    ".cache", "jspm_packages", "bower_components"]
-    exclusions = ["README.md", "package-lock.json", "pdm.lock", "__init__"]
-    if os.getenv("ALLOW_TEST_PATHS") != "yes":
-        paths_exclusions.append("test")
-    return any(pe in file_path for pe in paths_exclusions) or file in exclusions
+    return exclusion_matcher().search(file_path) is not None or file in exclusions
+
+# with a separator at the end "dist/"-like exclusions match the folder itself
+def is_dir_to_skip(dir_path, gitignores=()):
+    return is_file_to_skip(dir_path + os.sep) or is_ignored(dir_path, gitignores, True)
+
+def respect_gitignore():
+    return os.getenv("RESPECT_GITIGNORE", "yes") != "no"
+
+# gitignores - GitIgnore of the folder and its parents, from the top one.
+# The deepest file which decides on the path wins, as in git
+def is_ignored(path, gitignores, is_dir=False):
+    ignored = False
+    for gitignore in gitignores:
+        decision = gitignore.match(path, is_dir)
+        if decision is not None:
+            ignored = decision
+    return ignored
+
+def translate_glob(pattern):
+    res = ""
+    i = 0
+    while i < len(pattern):
+        if pattern.startswith("**/", i):
+            res += "(?:.*/)?"
+            i += 3
+        elif pattern.startswith("**", i):
+            res += ".*"
+            i += 2
+        elif pattern[i] == "*":
+            res += "[^/]*"
+            i += 1
+        elif pattern[i] == "?":
+            res += "[^/]"
+            i += 1
+        elif pattern[i] == "[" and "]" in pattern[i + 1:]:
+            end = pattern.index("]", i + 1)
+            chars = pattern[i + 1:end]
+            if chars.startswith("!"):
+                chars = "^" + chars[1:]
+            res += "[" + chars.replace("\\", "\\\\") + "]"
+            i = end + 1
+        else:
+            res += re.escape(pattern[i])
+            i += 1
+    return res
+
+# Patterns of one .gitignore file, applied to paths under its folder
+class GitIgnore:
+    def __init__(self, base_dir, lines):
+        self.base_dir = base_dir
+        self.rules = []
+        for line in lines:
+            line = line.rstrip("\n").rstrip()
+            if not line or line.startswith("#"):
+                continue
+            negate = line.startswith("!")
+            if negate:
+                line = line[1:]
+            if line.startswith("\\"):
+                line = line[1:]
+            dir_only = line.endswith("/")
+            line = line.rstrip("/")
+            if not line:
+                continue
+            # a slash at the beginning or in the middle anchors the pattern to the .gitignore folder
+            anchored = "/" in line
+            regex = translate_glob(line.lstrip("/"))
+            regex = ("^" if anchored else "(?:^|/)") + regex + "$"
+            self.rules.append((re.compile(regex), negate, dir_only))
+
+    @classmethod
+    def load(cls, base_dir):
+        with open(os.path.join(base_dir, ".gitignore"), "r", encoding="utf-8", errors="ignore") as f:
+            return cls(base_dir, f.readlines())
+
+    # True - ignored, False - explicitly not ignored, None - no pattern matches
+    def match(self, path, is_dir=False):
+        rel = os.path.relpath(path, self.base_dir).replace(os.sep, "/")
+        if rel.startswith(".."):
+            return None
+        decision = None
+        for regex, negate, dir_only in self.rules:
+            if dir_only and not is_dir:
+                continue
+            if regex.search(rel):
+                decision = not negate
+        return decision
 
 
 file_extensions = [
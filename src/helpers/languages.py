@@ -1,8 +1,9 @@
 import sys
 import os
 import importlib
+import threading
+from collections import OrderedDict
 CLASSES_HASH = {}
-INSTANCES_HASH = {}
 
 def get_ext(file_path):
     return file_path.lower().split('.')[-1]
@@ -28,27 +29,87 @@ load_plugins()
 ext_lang = {
     "py": "python",
     "js": "javascript",
+    "mjs": "javascript",
+    "cjs": "javascript",
+    "jsx": "javascript",
     "ts": "javascript",
+    "mts": "javascript",
+    "cts": "javascript",
+    "tsx": "javascript",
 }
 
-def get_instance(ext, file_path):
+def facts_cache_limit_bytes():
+    return int(float(os.getenv("LANG_FACTS_CACHE_MB", "64")) * 1024 * 1024)
+
+# rough size of extracted facts: strings and their containers
+def facts_size(value):
+    if isinstance(value, (set, list, tuple, frozenset)):
+        return 64 + sum(facts_size(v) for v in value)
+    if isinstance(value, dict):
+        return 64 + sum(facts_size(k) + facts_size(v) for k, v in value.items())
+    return 56 + len(str(value))
+
+# Facts extracted by plugins (env vars, comparisons, imports) per file, method and file version.
+# Plugin instances hold the whole file content, so only the last one is kept (per thread),
+# the facts are kept until max_bytes is reached, least recently used ones are dropped
+class FactsCache:
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.items = OrderedDict()
+        self.size = 0
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            if key not in self.items:
+                return False, None
+            self.items.move_to_end(key)
+            return True, self.items[key][0]
+
+    def put(self, key, value):
+        size = facts_size(value)
+        with self.lock:
+            if size > self.max_bytes or key in self.items:
+                return
+            self.items[key] = (value, size)
+            self.size += size
+            while self.size > self.max_bytes:
+                _, (_, old_size) = self.items.popitem(last=False)
+                self.size -= old_size
+
+FACTS_CACHE = FactsCache(facts_cache_limit_bytes())
+last_instance = threading.local()
+
+def get_instance(ext, file_path, version=None, content=None):
     if ext not in ext_lang:
         return None
     lang_name = ext_lang[ext]
-    if file_path in INSTANCES_HASH:
-        return INSTANCES_HASH[file_path]
+    if getattr(last_instance, "key", None) == (file_path, version):
+        return last_instance.instance
 
     if lang_name in CLASSES_HASH:
-        inst = CLASSES_HASH[lang_name](file_path)
-        INSTANCES_HASH[file_path] = inst
+        inst = CLASSES_HASH[lang_name](file_path, content)
+        last_instance.key = (file_path, version)
+        last_instance.instance = inst
         return inst
     
     return None
 
-def invoke_lang(file_path, method_name):
+# content - text of the file if it's already read, otherwise the plugin reads the file
+def invoke_lang(file_path, method_name, content=None):
     ext = get_ext(file_path)
-    inst = get_instance(ext, file_path)
+    if ext not in ext_lang:
+        return None
+    st = os.stat(file_path)
+    version = (st.st_mtime_ns, st.st_size)
+    key = (file_path, version, method_name)
+    found, facts = FACTS_CACHE.get(key)
+    if found:
+        return facts
+    inst = get_instance(ext, file_path, version, content)
     if not inst:
         return None
     method = getattr(inst, method_name)
-    return method()
\ No newline at end of file
+    facts = method()
+    FACTS_CACHE.put(key, facts)
+    return facts
@@ -1,9 +1,6 @@
-from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain.text_splitter import CharacterTextSplitter
-
-def split_readme_to_chunks(doc_path, chunk_size=500, chunk_overlap=50):
-    with open(doc_path, "r", encoding="utf-8") as f:
-        readme_text = f.read()
+def split_text_to_chunks(readme_text, chunk_size=500, chunk_overlap=50):
+    # langchain is slow to import, only use cases reading docs need it
+    from langchain.text_splitter import RecursiveCharacterTextSplitter
     splitter = RecursiveCharacterTextSplitter(
         separators=["\n### ", "\n## ", "\n# ", "\n\n", "\n", " "],
         chunk_size=chunk_size,
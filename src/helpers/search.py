@@ -0,0 +1,113 @@
+# Inverted index over documentation texts (chunks or whole documents), built once per run:
+# token -> texts with the token and its count in them.
+# Texts for a query are ranked with BM25, texts with a substring are found through the tokens
+# of the vocabulary containing it, so use cases check a few candidates instead of every text.
+# Before the embedding scoring doc chunks are narrowed to the top RETRIEVAL_TOP_N lexical candidates per query
+import os
+import re
+import math
+from bisect import bisect_right
+from collections import Counter, defaultdict
+from src.core.metrics import metrics
+
+# letters and digits, "_" and punctuation split tokens
+TOKEN = re.compile(r"[^\W_]+")
+
+# too common to tell chunks apart, not used for ranking
+STOP_WORDS = {"a", "an", "and", "are", "as", "at", "be", "by", "for", "from", "in", "is", "it", "of", "on", "or",
+    "the", "to", "that", "this", "with", "was", "were", "will", "can", "not", "into", "using", "used", "use"}
+
+def tokenize(text):
+    return TOKEN.findall(text.lower())
+
+def retrieval_top_n():
+    return int(os.getenv("RETRIEVAL_TOP_N", "20"))
+
+def retrieval_min_recall():
+    return float(os.getenv("RETRIEVAL_MIN_RECALL", "0.5"))
+
+class InvertedIndex:
+    def __init__(self, texts, k1=1.5, b=0.75):
+        self.texts = texts
+        self.k1 = k1
+        self.b = b
+        self.postings = defaultdict(dict)
+        self.lengths = []
+        for i, text in enumerate(texts):
+            tokens = tokenize(text)
+            self.lengths.append(len(tokens))
+            for token, n in Counter(tokens).items():
+                self.postings[token][i] = n
+        self.avg_length = sum(self.lengths) / len(texts) if texts else 0
+        # all tokens as one string, substrings of tokens are searched in it at once
+        self.vocabulary = sorted(self.postings)
+        self.vocabulary_text = "\n".join(self.vocabulary)
+        self.offsets = []
+        offset = 0
+        for token in self.vocabulary:
+            self.offsets.append(offset)
+            offset += len(token) + 1
+
+    def idf(self, token):
+        df = len(self.postings.get(token, ()))
+        return math.log(1 + (len(self.texts) - df + 0.5) / (df + 0.5))
+
+    # text index -> BM25 score, only texts with a token of the query
+    def scores(self, query):
+        scores = defaultdict(float)
+        for token in set(tokenize(query)) - STOP_WORDS:
+            postings = self.postings.get(token)
+            if not postings:
+                continue
+            idf = self.idf(token)
+            for i, tf in postings.items():
+                norm = self.k1 * (1 - self.b + self.b * self.lengths[i] / self.avg_length)
+                scores[i] += idf * tf * (self.k1 + 1) / (tf + norm)
+        return scores
+
+    # indexes of the best n texts for the query, best first
+    def search(self, query, n):
+        scores = self.scores(query)
+        return sorted(scores, key=lambda i: (-scores[i], i))[:n]
+
+    # tokens of the vocabulary with part (lower case letters and digits) inside
+    def infix_tokens(self, part):
+        found = set()
+        for m in re.finditer(re.escape(part), self.vocabulary_text):
+            found.add(self.vocabulary[bisect_right(self.offsets, m.start()) - 1])
+        return found
+
+    # indexes of texts containing the substring, the same as `substring in text` for every text
+    def containing(self, substring):
+        parts = tokenize(substring)
+        if not parts:
+            return [i for i, text in enumerate(self.texts) if substring in text]
+        # every part of the substring lies inside some token of a text with it, the longest is the rarest
+        candidates = set()
+        for token in self.infix_tokens(max(parts, key=len)):
+            candidates.update(self.postings[token])
+        return [i for i in sorted(candidates) if substring in self.texts[i]]
+
+    def contains(self, substring):
+        return bool(self.containing(substring))
+
+# Indexes of the texts worth comparing with the queries: top n lexical candidates of every query.
+# None means all texts - when there are not more of them than n, or when less than min_recall of the
+# queries have any lexical candidate (the docs use other words, only the embeddings can match them)
+def retrieve(index, queries, n=None, min_recall=None):
+    n = retrieval_top_n() if n is None else n
+    min_recall = retrieval_min_recall() if min_recall is None else min_recall
+    if n <= 0 or len(index.texts) <= n or not queries:
+        return None
+    found = set()
+    hits = 0
+    with metrics.phase("retrieval"):
+        for query in queries:
+            top = index.search(query, n)
+            hits += bool(top)
+            found.update(top)
+    if hits < min_recall * len(queries):
+        metrics.count("retrieval_full_scans")
+        return None
+    metrics.count("chunks_skipped", len(index.texts) - len(found))
+    return sorted(found)
@@ -6,4 +6,10 @@ class Language(ABC):
         pass
     @abstractmethod
     def fetch_comparisons(self):
-        pass
\ No newline at end of file
+        pass
+    # modules imported by the file, languages without it import nothing
+    def fetch_imports(self):
+        return set()
+    # the file runs as a script by itself (python: if __name__ == "__main__")
+    def fetch_main_marker(self):
+        return False
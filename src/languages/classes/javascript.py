@@ -1,31 +1,140 @@
-import ast
+import os
 import re
 from src.languages.abstract import Language
+from src.languages import jsparser
 
 class LanguagePlugin(Language):
-    def __init__(self, file_path):
-        with open(file_path, 'r', encoding='utf-8') as f:
-            txt = f.read()
-        self.content = txt
+    # content - text of the file when the caller has already read it
+    def __init__(self, file_path, content=None):
+        if content is None:
+            with open(file_path, 'r', encoding='utf-8') as f:
+                content = f.read()
+        self.content = content
         self.file_path = file_path
+        # JSFacts, or False without tree-sitter
+        self.parsed = None
+
+    # one parse and one walk over the syntax tree for all facts
+    def facts(self):
+        if self.parsed is None:
+            ext = self.file_path.lower().split('.')[-1]
+            tree = jsparser.parse(os.path.abspath(self.file_path), self.content.encode("utf-8"), ext)
+            self.parsed = JSFacts(tree) if tree else False
+        return self.parsed
 
-    # consider using ast
     def fetch_env_vars(self):
-        patterns = [
-            re.compile(r"process\.env\.([A-Z0-9_]+)"),
-            re.compile(r"process\.env\[['\"]([A-Z0-9_]+)['\"]\]"),
-        ]
-        matches_for_all_patterns = []
-        for p in patterns:
-            matches = p.findall(self.content)
-            if matches:
-                matches_for_all_patterns += matches
-        return list(set(matches_for_all_patterns))
-    
+        facts = self.facts()
+        if not facts:
+            return extract_env_vars(self.content)
+        return list(facts.env_vars)
 
     def fetch_comparisons(self):
-        comp = StringCheckExtractor(self.content, self.file_path)
-        return comp.important_constants
+        facts = self.facts()
+        if not facts:
+            comp = StringCheckExtractor(self.content, self.file_path)
+            return comp.important_constants
+        return facts.important_constants
+
+    # import ... from "x", export ... from "x", require("x"), import("x")
+    def fetch_imports(self):
+        facts = self.facts()
+        if not facts:
+            return extract_imports(self.content)
+        return facts.imports
+
+ENV_VAR_PATTERNS = [
+    re.compile(r"process\.env\.([A-Z0-9_]+)"),
+    re.compile(r"process\.env\[['\"]([A-Z0-9_]+)['\"]\]"),
+]
+ENV_VAR_NAME = re.compile(r"^[A-Z0-9_]+$")
+IMPORT_PATTERNS = [
+    re.compile(r"^\s*(?:import|export)\b[^'\"]*?\bfrom\s*['\"]([^'\"]+)['\"]", re.MULTILINE),
+    re.compile(r"^\s*import\s*['\"]([^'\"]+)['\"]", re.MULTILINE),
+    re.compile(r"\b(?:require|import)\s*\(\s*['\"]([^'\"]+)['\"]\s*\)"),
+]
+
+def extract_env_vars(file_content):
+    matches_for_all_patterns = []
+    for p in ENV_VAR_PATTERNS:
+        matches = p.findall(file_content)
+        if matches:
+            matches_for_all_patterns += matches
+    return list(set(matches_for_all_patterns))
+
+def extract_imports(file_content):
+    imports = set()
+    for p in IMPORT_PATTERNS:
+        imports.update(p.findall(file_content))
+    return imports
+
+CHECK_METHODS = {b"startsWith", b"endsWith", b"find", b"indexOf"}
+EQUALITY_OPERATORS = {"==", "===", "!=", "!=="}
+
+# text of a string literal, None for anything else (template strings with ${} included)
+def string_value(node):
+    if node is None:
+        return None
+    if node.type == "string" or (node.type == "template_string" and not any(c.type == "template_substitution" for c in node.children)):
+        return node.text[1:-1].decode("utf-8", errors="replace")
+    return None
+
+def is_process_env(node):
+    return node is not None and node.type == "member_expression" and node.text == b"process.env"
+
+# All facts of a JS/TS file in one walk over its syntax tree:
+# env vars (process.env.X, process.env["X"]), strings the code validates against, imports
+class JSFacts:
+    def __init__(self, tree):
+        self.env_vars = set()
+        self.important_constants = set()
+        self.imports = set()
+        cursor = tree.walk()
+        while True:
+            self.visit(cursor.node)
+            if cursor.goto_first_child():
+                continue
+            while not cursor.goto_next_sibling():
+                if not cursor.goto_parent():
+                    return
+
+    def add_constant(self, node):
+        value = string_value(node)
+        if value:
+            self.important_constants.add(value)
+
+    def visit(self, node):
+        kind = node.type
+        if kind == "member_expression":
+            if is_process_env(node.child_by_field_name("object")):
+                name = node.child_by_field_name("property").text.decode("utf-8", errors="replace")
+                if ENV_VAR_NAME.match(name):
+                    self.env_vars.add(name)
+        elif kind == "subscript_expression":
+            if is_process_env(node.child_by_field_name("object")):
+                name = string_value(node.child_by_field_name("index"))
+                if name and ENV_VAR_NAME.match(name):
+                    self.env_vars.add(name)
+        elif kind == "binary_expression":
+            if node.child_by_field_name("operator").type in EQUALITY_OPERATORS:
+                self.add_constant(node.child_by_field_name("left"))
+                self.add_constant(node.child_by_field_name("right"))
+        elif kind == "call_expression":
+            func = node.child_by_field_name("function")
+            args = node.child_by_field_name("arguments")
+            if func is None or args is None or args.type != "arguments":
+                return
+            first = args.named_children[0] if args.named_children else None
+            if func.type == "import" or (func.type == "identifier" and func.text == b"require"):
+                value = string_value(first)
+                if value:
+                    self.imports.add(value)
+            elif func.type == "member_expression" and func.child_by_field_name("property").text in CHECK_METHODS:
+                for arg in args.named_children:
+                    self.add_constant(arg)
+        elif kind in ("import_statement", "export_statement"):
+            value = string_value(node.child_by_field_name("source"))
+            if value:
+                self.imports.add(value)
 
 # tree-sitter-languages is pain, just regexps here
 # Covers python strings comparisons:
@@ -3,31 +3,93 @@ import re
 from src.languages.abstract import Language
 
 class LanguagePlugin(Language):
-    def __init__(self, file_path):
-        with open(file_path, 'r', encoding='utf-8') as f:
-            txt = f.read()
-        self.content = txt
+    # content - text of the file when the caller has already read it
+    def __init__(self, file_path, content=None):
+        if content is None:
+            with open(file_path, 'r', encoding='utf-8') as f:
+                content = f.read()
+        self.content = content
         self.file_path = file_path
+        # PythonFactsVisitor, or SyntaxError if the file doesn't parse
+        self.parsed = None
 
-    # consider using ast
+    # the file is parsed once for all facts
+    def facts(self):
+        if self.parsed is None:
+            try:
+                tree = ast.parse(self.content, filename=self.file_path)
+            except SyntaxError as e:
+                self.parsed = e
+            else:
+                self.parsed = PythonFactsVisitor(tree)
+        return self.parsed
+
+    # files which are not valid python fall back to regular expressions, where it's possible
     def fetch_env_vars(self):
-        patterns = [
-            re.compile(r"environ\.get\(['\"]([A-Z0-9_]+)['\"]"),
-            re.compile(r"environ\[['\"]([A-Z0-9_]+)['\"]"),
-            re.compile(r"getenv\(['\"]([A-Z0-9_]+)['\"]"),
-        ]
-        matches_for_all_patterns = []
-        for p in patterns:
-            matches = p.findall(self.content)
-            if matches:
-                matches_for_all_patterns += matches
-        return list(set(matches_for_all_patterns))
-    
+        facts = self.facts()
+        if isinstance(facts, SyntaxError):
+            return extract_env_vars(self.content)
+        return list(facts.env_vars)
 
     def fetch_comparisons(self):
-        comp = StringCheckExtractor(self.content, self.file_path)
-        return comp.important_constants
+        facts = self.facts()
+        if isinstance(facts, SyntaxError):
+            raise facts
+        return facts.important_constants
+
+    # imported modules, relative ones keep leading dots.
+    # For "from a import b" both a and a.b are returned, b can be a module
+    def fetch_imports(self):
+        facts = self.facts()
+        if isinstance(facts, SyntaxError):
+            return extract_imports(self.content)
+        return facts.imports
+
+    # if __name__ == "__main__": the file is run as a script
+    def fetch_main_marker(self):
+        facts = self.facts()
+        return not isinstance(facts, SyntaxError) and facts.main_marker
+
+ENV_VAR_PATTERNS = [
+    re.compile(r"environ\.get\(['\"]([A-Z0-9_]+)['\"]"),
+    re.compile(r"environ\[['\"]([A-Z0-9_]+)['\"]"),
+    re.compile(r"getenv\(['\"]([A-Z0-9_]+)['\"]"),
+]
+ENV_VAR_NAME = re.compile(r"^[A-Z0-9_]+$")
+
+def extract_env_vars(file_content):
+    matches_for_all_patterns = []
+    for p in ENV_VAR_PATTERNS:
+        matches = p.findall(file_content)
+        if matches:
+            matches_for_all_patterns += matches
+    return list(set(matches_for_all_patterns))
+
+def extract_imports(file_content):
+    imports = set()
+    import_pattern = re.compile(
+        r'^\s*import\s+([a-zA-Z0-9_. ,]+)',
+        re.MULTILINE
+    )
 
+    from_import_pattern = re.compile(
+        r'^\s*from\s+([a-zA-Z0-9_.]+)\s+import\s+',
+        re.MULTILINE
+    )
+
+    for match in import_pattern.findall(file_content):
+        parts = match.split(",")
+        for part in parts:
+            name = part.strip().split()[0]
+            if name:
+                imports.add(name)
+
+    for match in from_import_pattern.findall(file_content):
+        name = match.strip()
+        if name:
+            imports.add(name)
+
+    return imports
 
 
 class StringCheckExtractor(ast.NodeVisitor):
@@ -54,3 +116,57 @@ class StringCheckExtractor(ast.NodeVisitor):
                     if isinstance(arg, ast.Constant) and isinstance(arg.value, str):
                         self.important_constants.add(arg.value)
         self.generic_visit(node)
+
+
+# All facts of a python file in one walk over its tree:
+# env vars (os.getenv, os.environ.get, os.environ[...]), strings the code validates against,
+# imports and the __main__ marker
+class PythonFactsVisitor(StringCheckExtractor):
+    def __init__(self, tree):
+        self.important_constants = set()
+        self.env_vars = set()
+        self.imports = set()
+        self.main_marker = False
+        self.visit(tree)
+
+    def add_env_var(self, node):
+        if isinstance(node, ast.Constant) and isinstance(node.value, str) and ENV_VAR_NAME.match(node.value):
+            self.env_vars.add(node.value)
+
+    def visit_Call(self, node):
+        func = node.func
+        name = func.attr if isinstance(func, ast.Attribute) else func.id if isinstance(func, ast.Name) else None
+        is_environ_get = name == "get" and isinstance(func, ast.Attribute) and is_environ(func.value)
+        if (name == "getenv" or is_environ_get) and node.args:
+            self.add_env_var(node.args[0])
+        super().visit_Call(node)
+
+    def visit_Subscript(self, node):
+        if is_environ(node.value):
+            self.add_env_var(node.slice)
+        self.generic_visit(node)
+
+    def visit_Compare(self, node):
+        sides = [node.left] + node.comparators
+        if any(isinstance(n, ast.Name) and n.id == "__name__" for n in sides) \
+                and any(isinstance(n, ast.Constant) and n.value == "__main__" for n in sides):
+            self.main_marker = True
+        super().visit_Compare(node)
+
+    def visit_Import(self, node):
+        for alias in node.names:
+            self.imports.add(alias.name)
+        self.generic_visit(node)
+
+    def visit_ImportFrom(self, node):
+        module = "." * node.level + (node.module or "")
+        self.imports.add(module)
+        sep = "" if module.endswith(".") else "."
+        for alias in node.names:
+            if alias.name != "*":
+                self.imports.add(module + sep + alias.name)
+        self.generic_visit(node)
+
+# os.environ or environ
+def is_environ(node):
+    return (isinstance(node, ast.Attribute) and node.attr == "environ") or (isinstance(node, ast.Name) and node.id == "environ")
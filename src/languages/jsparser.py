@@ -0,0 +1,103 @@
+# JavaScript / TypeScript syntax trees with tree-sitter, if it's installed
+# (tree-sitter, tree-sitter-javascript, tree-sitter-typescript), otherwise plugins fall back to regular expressions.
+# One parser per language and thread is reused for all files.
+# A run parses every file once, so trees are not kept by default. A long-lived process scanning the same
+# project again can keep them with JS_TREE_CACHE_MB (sources and trees), a changed file is then parsed
+# incrementally from its old tree. Pool workers of facts extraction never keep trees
+import os
+import threading
+from collections import OrderedDict
+
+state = threading.local()
+
+def tree_cache_limit_bytes():
+    return int(float(os.getenv("JS_TREE_CACHE_MB", "0")) * 1024 * 1024)
+
+# rough memory of a syntax tree node, trees are counted by their node count
+NODE_BYTES = 64
+
+GRAMMARS = {"ts": "typescript", "mts": "typescript", "cts": "typescript", "tsx": "tsx"}
+
+def load_language(grammar):
+    import tree_sitter
+    if grammar == "typescript":
+        import tree_sitter_typescript
+        return tree_sitter.Language(tree_sitter_typescript.language_typescript())
+    if grammar == "tsx":
+        import tree_sitter_typescript
+        return tree_sitter.Language(tree_sitter_typescript.language_tsx())
+    import tree_sitter_javascript
+    return tree_sitter.Language(tree_sitter_javascript.language())
+
+# None if tree-sitter or the grammar is not installed
+def parser_for(ext):
+    if not hasattr(state, "parsers"):
+        state.parsers = {}
+        state.trees = OrderedDict()
+        state.trees_size = 0
+    grammar = GRAMMARS.get(ext, "javascript")
+    if grammar not in state.parsers:
+        try:
+            import tree_sitter
+            state.parsers[grammar] = tree_sitter.Parser(load_language(grammar))
+        except ImportError:
+            state.parsers[grammar] = None
+    return state.parsers[grammar]
+
+def common_prefix_length(a, b):
+    lo, hi = 0, min(len(a), len(b))
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        if a[:mid] == b[:mid]:
+            lo = mid
+        else:
+            hi = mid - 1
+    return lo
+
+def point(source, byte):
+    row = source.count(b"\n", 0, byte)
+    return (row, byte - (source.rfind(b"\n", 0, byte) + 1))
+
+# old tree edited to the changed range between old and new sources, for an incremental parse
+def edited_tree(tree, old, new):
+    start = common_prefix_length(old, new)
+    suffix = common_prefix_length(old[start:][::-1], new[start:][::-1])
+    old_end = len(old) - suffix
+    new_end = len(new) - suffix
+    tree.edit(start_byte=start, old_end_byte=old_end, new_end_byte=new_end,
+        start_point=point(old, start), old_end_point=point(old, old_end), new_end_point=point(new, new_end))
+    return tree
+
+# estimated memory of a kept source and its tree
+def cached_size(source, tree):
+    return len(source) + tree.root_node.descendant_count * NODE_BYTES
+
+def remember(file_path, source, tree):
+    trees = state.trees
+    if file_path in trees:
+        state.trees_size -= trees.pop(file_path)[2]
+    limit = tree_cache_limit_bytes()
+    size = cached_size(source, tree) if limit > 0 else 0
+    if limit <= 0 or size > limit:
+        return
+    trees[file_path] = (source, tree, size)
+    state.trees_size += size
+    while state.trees_size > limit:
+        _, (_, _, old_size) = trees.popitem(last=False)
+        state.trees_size -= old_size
+
+# syntax tree of the file source (bytes), None without tree-sitter
+def parse(file_path, source, ext):
+    parser = parser_for(ext)
+    if parser is None:
+        return None
+    known = state.trees.get(file_path)
+    if known and known[0] == source:
+        state.trees.move_to_end(file_path)
+        return known[1]
+    if known:
+        tree = parser.parse(source, edited_tree(known[1], known[0], source))
+    else:
+        tree = parser.parse(source)
+    remember(file_path, source, tree)
+    return tree
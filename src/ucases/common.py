@@ -3,9 +3,10 @@
 import os
 from src.helpers.exclusions import is_file_to_skip
 from src.core.report import Report
-from src.helpers.readme import split_readme_to_chunks
 from tqdm import tqdm
 from src.helpers.comparison import map_texts_cosine_with_cache, hybrid_strings_lists_comparison
+from src.helpers.search import retrieve
+from src.helpers.automaton import AhoCorasick
 
 categories = {
     "CI/CD": {
@@ -101,28 +102,37 @@ categories = {
 
 def report(project):
     r = Report("Common recommendations")
-    chunks = split_readme_to_chunks(project.doc_path, 100, 25)
+    chunks = project.doc_chunks(100, 25)
+    index = project.doc_index(100, 25)
     filtered_files = []
     for witem in project.walk_items:
         root = witem.root
-        files = witem.files
-        for file in files:
+        # file names are enough here, so also files not to be read
+        for file in witem.listed:
             file_path = os.path.join(root, file)
             cat = classify_file(file_path)
             if cat:
                 r.debug_add("(file_path, cat {}, {})", (file_path, cat))
                 filtered_files.append((file_path, cat))
 
+    # the verdict depends on the category only, it's evaluated once and applies to all its files
+    mentioned = {}
     for pr in tqdm(filtered_files):
         file_path = pr[0]
         cat = pr[1]
-        im = is_mentioned(cat, chunks)
-        if not im:
+        if cat not in mentioned:
+            mentioned[cat] = is_mentioned(cat, chunks, index)
+        if not mentioned[cat]:
             r.advice_add("File {} points on {} in your project. But it doesn't seem to be documented", (file_path, cat.upper()))
+    r.finish()
     return r
 
-def is_mentioned(cat, chunks):
+# only chunks lexically close to the description are compared, when the index is given
+def is_mentioned(cat, chunks, index=None):
     description = categories[cat]["description"]
+    candidates = retrieve(index, [description]) if index else None
+    if candidates is not None:
+        chunks = [chunks[i] for i in candidates]
     res = map_texts_cosine_with_cache([description], chunks)
     #res = map_texts_fuzz([description], chunks)
     for d in res:
@@ -133,12 +143,19 @@ def is_mentioned(cat, chunks):
     return False
 
 
-def classify_file(file_path):
-    path_lower = file_path.lower()
+# patterns of all categories in one automaton -> (position, name) of categories with them
+category_matchers = {}
 
-    for key, item in categories.items():
-        fpats = item["files_patterns"]
-        if any(kw in path_lower for kw in fpats):
-            return key
+def category_matcher():
+    if not category_matchers:
+        category_matchers["all"] = AhoCorasick(
+            (pattern, (i, key)) for i, (key, item) in enumerate(categories.items()) for pattern in item["files_patterns"])
+    return category_matchers["all"]
 
+# the first category with any of its patterns in the path
+def classify_file(file_path):
+    path_lower = file_path.lower()
+    found = category_matcher().find(path_lower)
+    if found:
+        return min(found)[1]
     return None
@@ -1,16 +1,17 @@
-# Endpoints are modules which are not imported by any other module
+# Endpoints are modules which are not imported by any other module, or run as scripts (if __name__ == "__main__")
 # Assuming that such files are entry points of services, or scripts, which should be documented
 # Only Python supported
 # If they are not yet, to recommend
 import os
 import re
+import sys
+import importlib.metadata
 from pathlib import Path
 from collections import defaultdict
-from src.core.project import Project
 from src.core.report import Report
-from src.helpers.readme import split_readme_to_chunks
 from src.helpers.comparison import fuzzy_score_lists
 from src.helpers.comparison import hybrid_strings_lists_comparison
+from src.helpers.search import retrieve
 
 def find_python_files(base, root, files):
     py_files = []
@@ -23,33 +24,6 @@ def find_python_files(base, root, files):
             py_files.append((module, full_path))
     return py_files
 
-# @TODO implement for all languages over Language class
-def extract_imports(file_content):
-    imports = set()
-    import_pattern = re.compile(
-        r'^\s*import\s+([a-zA-Z0-9_. ,]+)',
-        re.MULTILINE
-    )
-
-    from_import_pattern = re.compile(
-        r'^\s*from\s+([a-zA-Z0-9_.]+)\s+import\s+',
-        re.MULTILINE
-    )
-
-    for match in import_pattern.findall(file_content):
-        parts = match.split(",")
-        for part in parts:
-            name = part.strip().split()[0]
-            if name:
-                imports.add(name)
-
-    for match in from_import_pattern.findall(file_content):
-        name = match.strip()
-        if name:
-            imports.add(name)
-
-    return imports
-
 def conv_to_path(imp):
     return imp.replace(".", os.sep)
 
@@ -71,33 +45,93 @@ def grouped(base, file_paths):
 
     return dict(grouped)
 
-def get_eindpoints(directory):
-    project = Project(directory)
-    not_imported = []
-    imports = []
+def module_name(project_root, file_path):
+    parts = os.path.relpath(file_path, project_root)[:-3].split(os.sep)
+    if parts[-1] == "__init__":
+        parts = parts[:-1]
+    return ".".join(parts)
+
+# top level names of the standard library and installed distributions
+shadowing_names = None
+
+def shadowed(name):
+    global shadowing_names
+    if shadowing_names is None:
+        shadowing_names = set(sys.stdlib_module_names) | set(importlib.metadata.packages_distributions())
+    return name in shadowing_names
+
+# Python modules of the project by dotted name.
+# An import is looked up from the package of the importing file and its parents up to the project root,
+# nearest first: sources are not always importable from the project root (src/, lib/, services/...).
+# Only then a module is found by any dotted suffix of its name.
+# "import logging" never means a local logging.py other than the one in the project root
+class ModuleIndex:
+    def __init__(self, project_root, file_paths):
+        self.modules = {}
+        self.suffixes = defaultdict(list)
+        for file_path in file_paths:
+            name = module_name(project_root, file_path)
+            self.modules[name] = file_path
+            parts = name.split(".")
+            for i in range(1, len(parts)):
+                self.suffixes[".".join(parts[i:])].append(file_path)
+
+    # package - parts of the importing file package
+    def resolve(self, name, package=()):
+        if "." not in name and shadowed(name):
+            return [self.modules[name]] if name in self.modules else []
+        for i in range(len(package), -1, -1):
+            candidate = ".".join(list(package[:i]) + [name])
+            if candidate in self.modules:
+                return [self.modules[candidate]]
+        return self.suffixes.get(name, [])
+
+    # absolute name of a relative import, from the project root
+    def resolve_exact(self, name):
+        return [self.modules[name]] if name in self.modules else []
+
+# absolute name of an import made in package, None if it goes above the project root
+def absolute_import(imp, package):
+    level = len(imp) - len(imp.lstrip("."))
+    if level == 0:
+        return imp
+    if level - 1 > len(package):
+        return None
+    parts = package[:len(package) - (level - 1)]
+    if imp[level:]:
+        parts = parts + [imp[level:]]
+    return ".".join(parts)
+
+# file path -> set of project files it imports
+def import_graph(project, file_paths, index):
+    facts = project.facts()
+    graph = {}
+    for file_path in file_paths:
+        package = module_name(project.project_root, file_path).split(".")[:-1]
+        imported = set()
+        for imp in facts[file_path]["imports"]:
+            name = absolute_import(imp, package)
+            if not name:
+                continue
+            imported.update(index.resolve_exact(name) if imp.startswith(".") else index.resolve(name, package))
+        imported.discard(file_path)
+        graph[file_path] = imported
+    return graph
+
+# python modules which no other module imports, and scripts
+def get_eindpoints(project):
     all_py_files = []
     for witem in project.walk_items:
-        root = witem.root
-        files = witem.files
-        for file in files:
-            full_path = os.path.join(root, file)
+        for file in witem.files:
             if file.endswith(".py") and "__init__" not in file:
-                all_py_files.append(full_path)
-                with open(full_path, 'r', encoding='utf-8') as f:
-                    content = f.read()
-                imports += extract_imports(content)
-        #pyfiles += find_python_files(directory, root, files)
-    #print(all_py_files)
-    for full_path in all_py_files:
-        found = False
-        for im in imports:
-            if conv_to_path(im) in full_path:
-                found = True
-                break
-        if not found:
-            not_imported.append(full_path)
-    
-    return not_imported
+                all_py_files.append(os.path.join(witem.root, file))
+
+    index = ModuleIndex(project.project_root, all_py_files)
+    imported = set()
+    for targets in import_graph(project, all_py_files, index).values():
+        imported.update(targets)
+    facts = project.facts()
+    return [file_path for file_path in all_py_files if file_path not in imported or facts[file_path].get("main")]
 
 def norm(txt):
     return txt.replace(".py", "").replace("_", " ").replace("/", " ") # / is not from os here
@@ -112,16 +146,22 @@ def normalize_group(gr, groups):
 
 def report(p):
     r = Report("Endpoints")
-    endpoints = get_eindpoints(p.project_root) # flat list of abs paths
+    endpoints = get_eindpoints(p) # flat list of abs paths
     endpoints = [e.replace(p.project_root, "") for e in endpoints]
     #groups = grouped(p.project_root, endpoints)
-    readme_chunks = split_readme_to_chunks(p.doc_path, 150, 50)
+    readme_chunks = p.doc_chunks(150, 50)
+    queries = [norm(e) for e in endpoints]
+    # chunks lexically close to any endpoint, all of them if there are few or the names are not in the docs
+    candidates = retrieve(p.doc_index(150, 50), queries)
+    if candidates is not None:
+        readme_chunks = [readme_chunks[i] for i in candidates]
     #print([norm(e) for e in endpoints], readme_chunks)
-    total_scores, matched_rights = hybrid_strings_lists_comparison([norm(e) for e in endpoints], readme_chunks, 0.5)
+    total_scores, matched_rights = hybrid_strings_lists_comparison(queries, readme_chunks, 0.5)
     #print(endpoints, readme_chunks, total_scores, matched_rights)
     for i, score in enumerate(total_scores):
         if score == 0: # no readme chunks matched with this endpoint
             r.advice_add("\"{}\" seems to be an endpoint or script. But it's not documented. It can be also obsolete", (endpoints[i],))
 
+    r.finish()
     return r
     
\ No newline at end of file
@@ -2,23 +2,15 @@
 # which appear at the same level. We assume they belong to one class of entities and should be
 # documented
 import os
-import json
-import yaml
-from concurrent.futures import ThreadPoolExecutor
-from src.helpers.languages import invoke_lang
+import sys
 from itertools import product
 from tqdm import tqdm
 from src.core.report import Report
 from collections import defaultdict
 from string import punctuation
 import re
-from multiprocessing import Value
-from src.helpers.comparison import hybrid_strings_lists_comparison
-
-import time
-import sys
-
-start = time.time()
+from src.helpers.comparison import hybrid_strings_lists_comparison, EmbeddingMatrix, clean_items, top_k_neighbours
+import numpy as np
 
 class Parallents:
     def __init__(self, type, parent, items):
@@ -42,37 +34,6 @@ class Parallents:
 
         return "ParEnt (" + self.type + ", " + str(self.parallents) + "):\n" + txt + "\n"
 
-class IgnoreUnknownTagsLoader(yaml.SafeLoader):
-    """
-    Custom loader that ignores unknown YAML tags instead of throwing an error.
-    """
-
-def unknown_tag_handler(loader, tag_suffix, node):
-    return 'unknownyamltag'
-
-IgnoreUnknownTagsLoader.add_multi_constructor('', unknown_tag_handler)
-
-patterns = {
-    "py": [
-        re.compile(r"environ\.get\(['\"]([A-Z0-9_]+)['\"]"),
-        re.compile(r"environ\[['\"]([A-Z0-9_]+)['\"]"),
-        re.compile(r"getenv\(['\"]([A-Z0-9_]+)['\"]"),
-    ],
-    "js": [
-        re.compile(r"process\.env\.([A-Z0-9_]+)"),
-        re.compile(r"process\.env\[['\"]([A-Z0-9_]+)['\"]\]"),
-    ],
-    "ts": [
-        re.compile(r"process\.env\.([A-Z0-9_]+)"),
-        re.compile(r"process\.env\[['\"]([A-Z0-9_]+)['\"]\]"),
-    ]
-}
-
-
-def should_skip_root(root, base_path):
-    rel = os.path.relpath(root, base_path)
-    parts = rel.split(os.sep)
-    return any(p.startswith('.') for p in parts if p != '.')
 
 # Collects:
 # - files/folders in a folder
@@ -81,40 +42,27 @@ def should_skip_root(root, base_path):
 # there should be more than 1 item
 def collect_code_items(project):
     parent_instances = []
+    facts = project.facts()
     for witem in project.walk_items:
         root = witem.root
         files = witem.files
         dirs = witem.dirs
-        # skip hidden folders and all its content
-        # if should_skip_root(root, project.project_root):
-        #     continue
         file_list = []
-        for file in files:
+        # skipped files (binary, generated...) are not read, but still belong to the folder
+        for file in witem.listed:
             file_path = os.path.join(root, file)
             ext = file.lower().split('.')[-1]
-
-            if ext in ("yaml", "yml"):
-                with open(file_path, 'r', encoding='utf-8') as f:
-                    try:
-                        data = yaml.load(f, Loader=IgnoreUnknownTagsLoader)
-                    except Exception as e:
-                        print(e)
-                        data = {}
-                    if isinstance(data, dict):
-                        collect_yaml_keys(data, root, parent_instances, "YAML")
-            if ext == "json" and "package" not in file:
-                with open(file_path, "r", encoding="utf-8") as f:
-                    try:
-                        data = json.load(f)
-                    except Exception as e:
-                        print(e)
-                        data = {}
-                    if isinstance(data, dict):
-                        collect_yaml_keys(data, root, parent_instances, "JSON")
-            else:
-                envvars = invoke_lang(file_path, "fetch_env_vars")
-                if envvars:
-                    parent_instances.append(Parallents(type="file", parent=file_path, items=envvars))
+            if file in witem.skipped:
+                file_list.append(file.replace("." + ext, ""))
+                continue
+            file_facts = facts[file_path]
+
+            # yaml, json sections
+            for type, parent, keys in file_facts["key_groups"]:
+                parent_instances.append(Parallents(type=type, parent=parent, items=keys))
+            envvars = file_facts["env_vars"]
+            if envvars:
+                parent_instances.append(Parallents(type="file", parent=file_path, items=envvars))
             
             file_list.append(file.replace("." + ext, ""))
 
@@ -126,34 +74,10 @@ def collect_code_items(project):
 
     return res
 
-def collect_yaml_keys(data, parent_key, parent_instances, type):
-    if isinstance(data, dict):
-        keys = list(data.keys())
-        if keys:
-            parent_instances.append(Parallents(type=type, parent=parent_key, items=keys))
-        for key, value in data.items():
-            collect_yaml_keys(value, key, parent_instances, type)
-
-def extract_env_vars(file_path, ext, parent_instances):
-    with open(file_path, 'r', encoding='utf-8') as f:
-        txt = f.read()
-        if ext not in patterns:
-            return
-        matches_for_all_patterns = []
-        for p in patterns[ext]:
-            matches = p.findall(txt)
-            if matches:
-                matches_for_all_patterns += matches
-        parent_instances.append(Parallents(type="EnvVar", parent=file_path, items=list(set(matches_for_all_patterns))))
-
-
 # Collects documentation parallel entities:
 # 1. sections on the same level
 # 2. lists started with *, - or digit
-def collects_doc_parents(doc_path):
-    readme_content = ""
-    with open(doc_path, 'r', encoding='utf-8') as f:
-        readme_content = f.read()
+def collects_doc_parents(readme_content, doc_name="README"):
     lines = readme_content.splitlines()
     parallel_entities = {"h1": [], "h2": [], "h3": [], "lists": []}
     
@@ -206,11 +130,11 @@ def collects_doc_parents(doc_path):
     for key, items in parallel_entities.items():
         for item in items:
             if len(item) > 1:
-                res.append(Parallents(type="doc_" + key, parent="README " + key, items=item))
+                res.append(Parallents(type="doc_" + key, parent=doc_name + " " + key, items=item))
 
     return res
 
-def compare_par_ents(par_ent1, par_ent2):
+def compare_par_ents(par_ent1, par_ent2, embeddings=None):
     total_scores = []
 
     items1 = par_ent1.items
@@ -225,7 +149,7 @@ def compare_par_ents(par_ent1, par_ent2):
         return 0, [], {}
 
     # matched_rights has items2(docs) indecies
-    total_scores, matched_rights = hybrid_strings_lists_comparison(items1, items2)
+    total_scores, matched_rights = hybrid_strings_lists_comparison(items1, items2, embeddings=embeddings)
     #total_scores = compare_fuzz(items1, items2)
 
     if len([s for s in total_scores if s !=0]) == 1: # if only one items matched, skip it, garbage
@@ -235,17 +159,48 @@ def compare_par_ents(par_ent1, par_ent2):
     return res, total_scores, matched_rights
 
 
+# All unique items of code and doc Parallents are encoded at once,
+# so comparing pairs doesn't call the model anymore
+def embed_parallents(list1, list2):
+    texts = []
+    for p in list1 + list2:
+        texts += clean_items(p.items)
+    return EmbeddingMatrix(texts)
+
+# Blocking for big projects: every Parallents is summarized by the mean embedding of its items
+# and a code group is compared only with top_k closest doc groups instead of all of them.
+# Pairs which compare_par_ents would reject by size are not candidates
+def candidate_pairs(list1, list2, embeddings, top_k):
+    sigs1 = np.array([embeddings.mean(clean_items(p.items)) for p in list1])
+    sigs2 = np.array([embeddings.mean(clean_items(p.items)) for p in list2])
+    sizes1 = np.array([len(p.items) for p in list1])
+    sizes2 = np.array([len(p.items) for p in list2])
+    def sizes_match(start, stop):
+        block = sizes1[start:stop, None]
+        return np.maximum(block, sizes2[None, :]) / np.maximum(np.minimum(block, sizes2[None, :]), 1) <= 3
+    neighbours = top_k_neighbours(sigs1, sigs2, top_k, mask=sizes_match)
+    return [(list1[i], list2[j]) for i, js in enumerate(neighbours) for j in js]
+
 # list1 - list of code Parallents instances. list2 - list of doc Parallents instances
-def sort_parent_pairs(list1, list2):
+def sort_parent_pairs(list1, list2, embeddings=None):
     pairs = []
+    if not list1 or not list2:
+        return pairs
     #for p1, p2 in product(list1, list2):
     total = len(list1)*len(list2)
-    if total > 50000:
-        print(f"Too many items to compare ({total} operations). Skipping due to potentially too long execution")
-        return pairs
-    for p1, p2 in tqdm(product(list1, list2), total=total, desc="Analyzing.."):
+    if embeddings is None:
+        embeddings = embed_parallents(list1, list2)
+    max_pairs = int(os.getenv("PARALLENTS_MAX_PAIRS", "50000"))
+    if total > max_pairs:
+        top_k = int(os.getenv("PARALLENTS_TOP_K", "5"))
+        print(f"Too many items to compare ({total} operations). Comparing only {top_k} closest doc groups for every code group", file=sys.stderr)
+        candidates = candidate_pairs(list1, list2, embeddings, top_k)
+        total = len(candidates)
+    else:
+        candidates = product(list1, list2)
+    for p1, p2 in tqdm(candidates, total=total, desc="Analyzing.."):
         # matched_rights has items2(docs) indecies
-        score, total_scores, matched_rights = compare_par_ents(p1, p2)
+        score, total_scores, matched_rights = compare_par_ents(p1, p2, embeddings)
         #print(score, p1.items, p2.items, matched_rights)
         if score > 0:
             p1.total_scores = total_scores
@@ -258,7 +213,8 @@ def sort_parent_pairs(list1, list2):
 def report(project):
     r = Report("Parallel entities")
     parent_instances =  collect_code_items(project)
-    doc_parents = collects_doc_parents(project.doc_path)
+    doc_parents = [parent for doc_path, content in zip(project.doc_paths, project.doc_contents())
+        for parent in collects_doc_parents(content, project.doc_name(doc_path))]
     r.debug_add("Found {} code items and {} doc items", (str(len(parent_instances)), str(len(doc_parents))))
     pairs = sort_parent_pairs(parent_instances, doc_parents)
     for st in pairs:
@@ -275,17 +231,16 @@ def report(project):
                     corresponded_code_index = matched_rights[i]["with"]
                     score = matched_rights[i]["score"]
                     if corresponded_code_index >= len(code.items):
-                        print(f"WARNING. corresponded_code_index {corresponded_code_index} not found in code.items", code.items)
+                        print(f"WARNING. corresponded_code_index {corresponded_code_index} not found in code.items", code.items, file=sys.stderr)
                         continue
                     documented.append(corresponded_code_index)
-                    explanation_items.append(["Found item in documentation '{}' (from {}) matched with item in code '{}' ({}) {}", (item, doc.parent, code.items[corresponded_code_index], code.parent, score)])
+                    explanation_items.append(["Found item in documentation '{}' (from {}) matched with item in code '{}' ({}) {}", (item, doc.parent, code.items[corresponded_code_index], code.parent, score), score])
             # @TODO CHECK FOR EXTRA NON EXISTING ITEM
             if n < len(code.items): # report only something is missing
                 for exp in explanation_items:
-                    r.meta_add(exp[0], exp[1])
+                    r.meta_add(exp[0], exp[1], exp[2])
                 items_to_document = [item for i, item in enumerate(code.items) if i not in documented]
-                r.advice_add("You probably want to document other items from {}: {}", (code.parent, items_to_document))
+                r.advice_add("You probably want to document other items from {}: {}", (code.parent, items_to_document), st[2])
 
-    end = time.time()
-    r.execution_time = end - start
+    r.finish()
     return r
\ No newline at end of file
@@ -5,11 +5,9 @@ from src.helpers.exclusions import is_file_to_skip, is_in_common_tech_terms
 from src.languages.classes.python import StringCheckExtractor as PyStringCheckExtractor
 from src.languages.classes.javascript import StringCheckExtractor as JSStringCheckExtractor
 from src.core.report import Report
-from src.helpers.languages import invoke_lang
 
 
-def extract_external_constants(file_path, constants_dict):
-    important_constants = invoke_lang(file_path, "fetch_comparisons")
+def extract_external_constants(file_path, important_constants, constants_dict):
     if not important_constants:
         return
     for const in important_constants:
@@ -23,17 +21,16 @@ def extract_external_constants(file_path, constants_dict):
 def report(p):
     r = Report("Variables validation")
     constants_dict = {}
-    with open(p.doc_path, 'r', encoding='utf-8') as f:
-        doc = str(f.read())
+    # documentation files with the constant are looked up in the index, not scanned one by one
+    doc_index = p.doc_index()
 
-    for witem in p.walk_items:
-        for file in witem.files:
-            file_path = os.path.join(witem.root, file)
-            extract_external_constants(file_path, constants_dict)
+    for file_path, facts in p.facts().items():
+        extract_external_constants(file_path, facts["comparisons"], constants_dict)
 
     sorted_constants = sorted(constants_dict.items(), key=lambda item: item[1][0], reverse=True)
     for const, count_list in sorted_constants:
-        if count_list[0] > 0 and const not in doc:
+        if count_list[0] > 0 and not doc_index.contains(const):
             r.advice_add("It looks like you validate against <{}>({}) from {}. Potential values could be documented", (const, count_list[0], count_list[1]))
 
+    r.finish()
     return r
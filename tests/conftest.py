@@ -0,0 +1,7 @@
+import pytest
+
+# facts and embeddings stored by tests don't go to the user's ~/.cache
+@pytest.fixture(autouse=True)
+def cache_dirs(tmp_path, monkeypatch):
+    monkeypatch.setenv("FACT_STORE_DIR", str(tmp_path / "facts"))
+    monkeypatch.setenv("EMBEDDING_CACHE_DIR", str(tmp_path / "embeddings"))
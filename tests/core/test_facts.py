@@ -0,0 +1,30 @@
+import builtins
+import os
+from src.core import facts
+from src.helpers import languages
+from src.helpers.languages import FactsCache
+
+def create_file(path, fname, content):
+    filename = os.path.join(path, fname)
+    with open(filename, "w") as f:
+        f.write(content)
+    return filename
+
+
+# every file is opened once, plugins and data keys get its text, other files are not read
+def test_extract_file_facts_reads_once(tmp_path, monkeypatch):
+    monkeypatch.setattr(languages, "FACTS_CACHE", FactsCache(1024 * 1024))
+    py = create_file(tmp_path, "app.py", "import os\nif os.getenv('MODE') == 'debug':\n    pass\n")
+    yml = create_file(tmp_path, "config.yml", "db:\n  host: x\n  port: 1\n")
+    txt = create_file(tmp_path, "notes.txt", "MODE")
+    opened = []
+    real_open = builtins.open
+    monkeypatch.setattr(builtins, "open", lambda file, *args, **kwargs: opened.append(file) or real_open(file, *args, **kwargs))
+
+    py_facts = facts.extract_file_facts(py)
+    assert py_facts["env_vars"] == ["MODE"]
+    assert py_facts["comparisons"] == ["debug"]
+    assert py_facts["imports"] == ["os"]
+    assert facts.extract_file_facts(yml)["key_groups"] == [("YAML", str(tmp_path), ["db"]), ("YAML", "db", ["host", "port"])]
+    assert facts.extract_file_facts(txt)["env_vars"] == []
+    assert opened == [py, yml]
@@ -0,0 +1,99 @@
+import pytest
+import os
+import hashlib
+from src.core import factstore
+from src.core.factstore import FactStore
+
+def create_file(path, fname, content):
+    filename = os.path.join(path, fname)
+    with open(filename, "w") as f:
+        f.write(content)
+    return filename
+
+class Extractor:
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, file_paths, digests=False):
+        self.calls.append(list(file_paths))
+        res = []
+        for p in file_paths:
+            if not os.path.exists(p):
+                res.append(({}, None))
+                continue
+            with open(p, "rb") as f:
+                res.append(({"size": os.path.getsize(p)}, hashlib.sha1(f.read()).hexdigest()))
+        return res
+
+
+# second run parses only the changed file, removed files are forgotten
+def test_fact_store_extracts_only_changed_files(tmp_path):
+    db_path = str(tmp_path / "facts.sqlite")
+    project = tmp_path / "project"
+    project.mkdir()
+    f1 = create_file(project, "a.py", "a = 1")
+    f2 = create_file(project, "b.py", "b = 2")
+    f3 = create_file(project, "c.py", "c = 3")
+    extract = Extractor()
+
+    store = FactStore(str(project), db_path)
+    assert store.sync([f1, f2, f3], extract) == [{"size": 5}, {"size": 5}, {"size": 5}]
+    store.close()
+
+    create_file(project, "b.py", "b = 22")
+    os.remove(f3)
+    store = FactStore(str(project), db_path)
+    assert store.sync([f1, f2], extract) == [{"size": 5}, {"size": 6}]
+    assert extract.calls[1] == [f2]
+    assert [row[0] for row in store.conn.execute("SELECT path FROM files ORDER BY path")] == [f1, f2]
+    store.close()
+
+
+# same size and same mtime, but other content. Caught by the digest, because it's written right after the scan
+def test_fact_store_checks_digest_of_racy_files(tmp_path):
+    db_path = str(tmp_path / "facts.sqlite")
+    f1 = create_file(tmp_path, "a.py", "a = 1")
+    st = os.stat(f1)
+    extract = Extractor()
+
+    store = FactStore(str(tmp_path), db_path)
+    store.sync([f1], extract)
+    create_file(tmp_path, "a.py", "a = 2")
+    os.utime(f1, ns=(st.st_atime_ns, st.st_mtime_ns))
+    store.sync([f1], extract)
+    assert extract.calls == [[f1], [f1]]
+    store.close()
+
+
+# facts extracted with other data keys settings are extracted again
+def test_fact_store_keyed_by_settings(tmp_path, monkeypatch):
+    db_path = str(tmp_path / "facts.sqlite")
+    f1 = create_file(tmp_path, "a.yaml", "a: 1")
+    extract = Extractor()
+    for depth in ["20", "20", "3"]:
+        monkeypatch.setenv("DATA_MAX_DEPTH", depth)
+        store = FactStore(str(tmp_path), db_path)
+        store.sync([f1], extract)
+        store.close()
+    assert extract.calls == [[f1], [], [f1]]
+
+
+# digests of extracted files come from the extraction, files removed after the walk are not stored
+def test_fact_store_reads_changed_files_once(tmp_path, monkeypatch):
+    db_path = str(tmp_path / "facts.sqlite")
+    f1 = create_file(tmp_path, "a.py", "a = 1")
+    f2 = create_file(tmp_path, "b.py", "b = 1")
+    f3 = os.path.join(tmp_path, "gone.py")
+    digested = []
+    file_digest = factstore.file_digest
+    monkeypatch.setattr(factstore, "file_digest", lambda path: digested.append(path) or file_digest(path))
+    extract = Extractor()
+
+    store = FactStore(str(tmp_path), db_path)
+    assert store.sync([f1, f2, f3], extract) == [{"size": 5}, {"size": 5}, {}]
+    assert digested == []
+    assert [row[0] for row in store.conn.execute("SELECT path FROM files ORDER BY path")] == [f1, f2]
+    os.remove(f2)
+    assert store.sync([f1, f2], extract) == [{"size": 5}, {}]
+    assert [row[0] for row in store.conn.execute("SELECT path FROM files")] == [f1]
+    store.close()
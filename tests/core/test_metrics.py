@@ -0,0 +1,29 @@
+import pytest
+from src.core.metrics import Metrics, metrics, format_metrics
+from src.core.report import Report
+
+def test_metrics_phases_and_counters():
+    m = Metrics()
+    with m.phase("embedding"):
+        m.count("strings_encoded", 3)
+    earlier = m.snapshot()
+    with m.phase("scoring"):
+        m.count("pairs_compared", 6)
+    m.count("strings_encoded")
+    assert m.since(earlier)["counters"] == {"pairs_compared": 6, "strings_encoded": 1}
+    assert list(m.since(earlier)["phases"]) == ["scoring"]
+    assert m.snapshot()["phases"]["embedding"] >= 0
+
+
+# a report gets what happened between its creation and finish
+def test_report_finish_records_its_metrics():
+    metrics.count("files_read", 5)
+    r = Report("Some use case")
+    metrics.count("files_read", 2)
+    with metrics.phase("scoring"):
+        pass
+    r.finish()
+    assert r.execution_time >= 0
+    assert r.metrics["counters"] == {"files_read": 2}
+    assert "files_read 2" in format_metrics(r.metrics)
+    assert r.metrics_dict()["usecase"] == "Some use case"
@@ -0,0 +1,144 @@
+import pytest
+import shutil
+import os
+from src.core.project import ContentCache, Project
+
+# Remove test paths from exclusions
+@pytest.fixture(autouse=True, scope="session")
+def set_env():
+    os.environ["ALLOW_TEST_PATHS"] = "yes"
+
+def create_file(path, fname, content):
+    filename = os.path.join(path, fname)
+    with open(filename, "w") as f:
+        f.write(content)
+    return filename
+
+# third file doesn't fit, the least recently used one is dropped
+def test_content_cache_evicts_least_recently_used():
+    loads = []
+    def loader(value):
+        def load():
+            loads.append(value)
+            return value
+        return load
+
+    cache = ContentCache(max_bytes=8)
+    cache.get("a", loader("aaaa"))
+    cache.get("b", loader("bbbb"))
+    cache.get("a", loader("aaaa"))
+    cache.get("c", loader("cccc"))
+    assert list(cache.items) == ["a", "c"]
+    cache.get("a", loader("aaaa"))
+    assert loads == ["aaaa", "bbbb", "cccc"]
+
+
+# bigger than the whole cache, returned but not kept
+def test_content_cache_skips_too_big_values():
+    cache = ContentCache(max_bytes=2)
+    assert cache.get("a", lambda: "aaaa") == "aaaa"
+    assert cache.size == 0
+
+
+# the limit is in bytes, not characters
+def test_content_cache_counts_bytes():
+    cache = ContentCache(max_bytes=8)
+    cache.get("a", lambda: "ééé")
+    assert cache.size == 6
+    cache.get("b", lambda: "éé")
+    assert list(cache.items) == ["b"]
+
+
+# excluded and ignored folders are not walked, ignored files are not listed
+def test_project_walk_prunes_excluded():
+    path_to_project = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "mocks", "core", "project")
+    for folder in ["node_modules/lib", "generated", "src/dist"]:
+        os.makedirs(os.path.join(path_to_project, folder), exist_ok=True)
+    create_file(path_to_project, "README.md", "Hello")
+    create_file(path_to_project, ".gitignore", "generated/\n*.log\n")
+    create_file(os.path.join(path_to_project, "src"), ".gitignore", "!keep.log\n")
+    create_file(os.path.join(path_to_project, "src"), "main.py", "")
+    create_file(os.path.join(path_to_project, "src"), "debug.log", "")
+    create_file(os.path.join(path_to_project, "src"), "keep.log", "")
+    create_file(os.path.join(path_to_project, "generated"), "models.py", "")
+    create_file(os.path.join(path_to_project, "node_modules", "lib"), "index.js", "")
+    p = Project(path_to_project)
+    roots = [os.path.relpath(w.root, path_to_project) for w in p.walk_items]
+    assert sorted(roots) == [".", "src"]
+    files = sorted(os.path.relpath(f, path_to_project) for f in p.file_paths())
+    assert files == [os.path.join("src", "keep.log"), os.path.join("src", "main.py")]
+
+
+# README.md and Markdown files of doc roots make one documentation corpus
+def test_project_doc_corpus(monkeypatch):
+    monkeypatch.setenv("DOC_ROOTS", "docs, guide.md")
+    path_to_project = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "mocks", "core", "project")
+    os.makedirs(os.path.join(path_to_project, "docs", "deploy"), exist_ok=True)
+    readme = create_file(path_to_project, "README.md", "# Project\nHello")
+    install = create_file(os.path.join(path_to_project, "docs"), "install.md", "# Install\npip install doctor")
+    helm = create_file(os.path.join(path_to_project, "docs", "deploy"), "helm.md", "# Helm\nSet the TOKEN value")
+    create_file(os.path.join(path_to_project, "docs"), "notes.txt", "Not markdown")
+    guide = create_file(path_to_project, "guide.md", "# Guide\nRead me")
+    p = Project(path_to_project)
+    assert p.doc_paths == [os.path.normpath(f) for f in (readme, install, helm, guide)]
+    assert p.doc_name(p.doc_paths[2]) == os.path.join("docs", "deploy", "helm")
+    assert p.doc_chunks(100, 0) == ["# Project\nHello", "# Install\npip install doctor", "# Helm\nSet the TOKEN value", "# Guide\nRead me"]
+    assert p.doc_index(100, 0).search("install", 2) == [1]
+    assert p.doc_index().containing("TOKEN") == [2]
+    assert p.doc_index() is p.doc_index()
+
+
+# docs folder without README.md is enough
+def test_project_docs_without_readme():
+    path_to_project = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "mocks", "core", "project")
+    os.makedirs(os.path.join(path_to_project, "docs"), exist_ok=True)
+    with pytest.raises(Exception):
+        Project(path_to_project)
+    create_file(os.path.join(path_to_project, "docs"), "index.md", "Hello")
+    assert len(Project(path_to_project).doc_paths) == 1
+
+
+# files_read counts the sources read by facts extraction with the docs
+def test_project_counts_source_reads(monkeypatch):
+    from src.core.metrics import metrics
+    monkeypatch.setenv("FACT_STORE", "no")
+    path_to_project = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "mocks", "core", "project")
+    os.makedirs(os.path.join(path_to_project, "src"), exist_ok=True)
+    create_file(path_to_project, "README.md", "# Project")
+    create_file(os.path.join(path_to_project, "src"), "main.py", "import os")
+    create_file(os.path.join(path_to_project, "src"), "config.yml", "a: 1")
+    create_file(os.path.join(path_to_project, "src"), "notes.txt", "notes")
+    metrics.reset()
+    p = Project(path_to_project)
+    p.facts()
+    p.doc_contents()
+    assert metrics.snapshot()["counters"]["files_read"] == 3
+
+
+# doc files which can't be read are skipped like project files, doc folders are pruned like in the scan
+def test_project_docs_skipped(monkeypatch):
+    path_to_project = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "mocks", "core", "project")
+    for folder in ["docs/drafts", "docs/node_modules/pkg", "docs/build"]:
+        os.makedirs(os.path.join(path_to_project, folder), exist_ok=True)
+    readme = create_file(path_to_project, "README.md", "# Project\nHello")
+    create_file(path_to_project, ".gitignore", "drafts/\n")
+    create_file(os.path.join(path_to_project, "docs"), ".gitignore", "*.local.md\n")
+    install = create_file(os.path.join(path_to_project, "docs"), "install.md", "# Install")
+    create_file(os.path.join(path_to_project, "docs"), "notes.local.md", "# Local")
+    create_file(os.path.join(path_to_project, "docs", "drafts"), "draft.md", "# Draft")
+    create_file(os.path.join(path_to_project, "docs", "node_modules", "pkg"), "readme.md", "# Package")
+    create_file(os.path.join(path_to_project, "docs", "build"), "out.md", "# Built")
+    with open(os.path.join(path_to_project, "docs", "legacy.md"), "wb") as f:
+        f.write("# Caf\u00e9".encode("latin-1"))
+    p = Project(path_to_project)
+    assert p.doc_paths == [os.path.normpath(f) for f in (readme, install)]
+    assert p.skipped_counts["encoding"] == 1
+    assert p.doc_content() == "# Project\nHello\n\n# Install"
+
+
+@pytest.fixture(scope="function", autouse=True)
+def session_cleanup():
+    yield
+    path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "mocks", "core")
+    if os.path.isdir(path):
+        shutil.rmtree(path)
@@ -0,0 +1,66 @@
+import pytest
+import json
+import numpy as np
+from src.core import report
+from src.core.report import Report
+
+# every item is written when added, the summary closes the use case
+def test_report_streams_jsonl(tmp_path, monkeypatch, capsys):
+    output = tmp_path / "report.jsonl"
+    monkeypatch.setenv("REPORT_FORMAT", "jsonl")
+    monkeypatch.setenv("REPORT_OUTPUT", str(output))
+    monkeypatch.setattr(report, "stream_file", None)
+    monkeypatch.setattr(report, "stream_fields", {"project": "/srv/app"})
+
+    r = Report("Parallel entities")
+    r.advice_add("You probably want to document other items from {}: {}", ("services", ["auth", "users"]), np.float32(0.75))
+    assert json.loads(output.read_text())["score"] == 0.75
+    r.meta_add("Found {}", ("auth",))
+    r.debug_add("Found {} code items", ("3",))
+    r.finish()
+    r.print()
+
+    records = [json.loads(line) for line in output.read_text().splitlines()]
+    assert [rec["type"] for rec in records] == ["advice", "meta", "summary"]
+    assert records[0]["subs"] == ["services", ["auth", "users"]]
+    assert records[0]["text"] == "You probably want to document other items from services: auth, users"
+    assert records[0]["project"] == "/srv/app"
+    assert records[2]["advices"] == 1
+    assert capsys.readouterr().out == ""
+
+# diagnostics go to stderr, stdout has only jsonl records
+def test_diagnostics_stay_out_of_jsonl(tmp_path, monkeypatch, capsys):
+    from src.core import facts
+    monkeypatch.delenv("REPORT_OUTPUT", raising=False)
+    monkeypatch.setattr(report, "stream_fields", {})
+    report.write_record({"type": "project"})
+    assert facts.invoke_fact(str(tmp_path / "missing.py"), "env_vars") == []
+    captured = capsys.readouterr()
+    assert [json.loads(line)["type"] for line in captured.out.splitlines()] == ["project"]
+    assert "missing.py" in captured.err
+
+# a record is appended with one write, files opened by other processes keep whole lines
+def test_records_appended_whole(tmp_path, monkeypatch):
+    output = tmp_path / "report.jsonl"
+    output.write_text('{"type": "project"}\n')
+    monkeypatch.setenv("REPORT_OUTPUT", str(output))
+    monkeypatch.setattr(report, "stream_file", None)
+    monkeypatch.setattr(report, "stream_fields", {})
+    report.write_record({"type": "summary"})
+    report.write_record({"type": "summary"})
+    assert [json.loads(line)["type"] for line in output.read_text().splitlines()] == ["project", "summary", "summary"]
+
+# a run record closes the run, findings without a score have no score field
+def test_run_summary_record(monkeypatch, capsys):
+    monkeypatch.setenv("REPORT_FORMAT", "jsonl")
+    monkeypatch.delenv("REPORT_OUTPUT", raising=False)
+    monkeypatch.setattr(report, "stream_fields", {})
+    r = Report("Endpoints")
+    r.advice_add("\"{}\" seems to be an endpoint or script", ("bin/cli.py",))
+    r.finish()
+    report.write_run_summary([r, Report("Common recommendations")], 1.5, "failed")
+    records = [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+    assert [rec["type"] for rec in records] == ["advice", "summary", "run"]
+    assert "score" not in records[0]
+    assert records[2] == {"type": "run", "usecases": ["Endpoints", "Common recommendations"], "advices": 1, "meta": 0,
+        "execution_time": 1.5, "error": "failed"}
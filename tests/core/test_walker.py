@@ -0,0 +1,36 @@
+import pytest
+import os
+from src.core.walker import walk, classify_file
+
+def create_file(path, fname, content, mode="w"):
+    filename = os.path.join(path, fname)
+    with open(filename, mode) as f:
+        f.write(content)
+    return filename
+
+# threaded walk gives the same folders in the same order as os.walk
+@pytest.mark.parametrize("threads", [1, 4])
+def test_walk_same_as_os_walk(tmp_path, threads):
+    for folder in ["a/b/c", "a/d", "e", "f/g"]:
+        os.makedirs(tmp_path / folder)
+        create_file(tmp_path / folder, "x.py", "")
+    # listed with the folders, not walked into
+    os.symlink(tmp_path / "a", tmp_path / "f" / "link")
+    expected = [(root, sorted(dirs), sorted(files)) for root, dirs, files in os.walk(tmp_path)]
+    res = [(root, sorted(dirs), sorted(files)) for root, dirs, files, sizes in walk(str(tmp_path), threads)]
+    assert res == expected
+
+
+def test_classify_file(tmp_path, monkeypatch):
+    monkeypatch.setenv("MAX_FILE_SIZE_KB", "1")
+    cases = {
+        create_file(tmp_path, "main.py", "import os\nprint(1)\n"): None,
+        create_file(tmp_path, "empty.py", ""): None,
+        create_file(tmp_path, "logo.png", b"\x89PNG\r\n\x1a\n\0\0\0\rIHDR", "wb"): "binary",
+        create_file(tmp_path, "latin.txt", "caf\xe9".encode("latin-1"), "wb"): "encoding",
+        create_file(tmp_path, "app.min.js", "var a=1;"): "generated",
+        create_file(tmp_path, "bundle.js", "var a=1;" * 126): "generated",
+        create_file(tmp_path, "big.py", "a = 1\n" * 200): "oversized",
+    }
+    for file_path, reason in cases.items():
+        assert classify_file(file_path, os.path.getsize(file_path)) == reason
@@ -0,0 +1,18 @@
+import random
+from src.helpers.automaton import AhoCorasick
+
+
+# the same values as an `in` check of every pattern
+def test_aho_corasick_matches_substring_checks():
+    rng = random.Random(3)
+    patterns = ["he", "she", "his", "hers", "test", "tests", "st", "a", "/iac/", "ci.yml", "", "abab", "bab"]
+    matcher = AhoCorasick((p, i) for i, p in enumerate(patterns))
+    for _ in range(2000):
+        text = "".join(rng.choice("abehirst/ci.yml") for _ in range(rng.randint(0, 20)))
+        assert matcher.find(text) == {i for i, p in enumerate(patterns) if p in text}, text
+
+
+def test_aho_corasick_shared_values():
+    matcher = AhoCorasick([("dockerfile", "deploy"), ("docker-compose", "deploy"), ("test", "tests")])
+    assert matcher.find("/app/docker-compose.test.yml") == {"deploy", "tests"}
+    assert matcher.find("/app/main.py") == set()
@@ -0,0 +1,96 @@
+import pytest
+import random
+import numpy as np
+from src.helpers import comparison
+from src.helpers.comparison import map_texts_cosine_with_cache, EmbeddingMatrix, hybrid_score, hybrid_score_matrix, longest_common_substring_score, top_k_neighbours
+
+# deterministic encoder instead of the real model, letters frequencies as a vector
+class LettersModel:
+    def __init__(self):
+        self.calls = []
+
+    def encode(self, texts, batch_size=32):
+        self.calls.append(list(texts))
+        return np.array([[t.lower().count(c) + 0.1 for c in "abcdefghijklmnopqrstuvwxyz"] for t in texts], dtype=np.float32)
+
+@pytest.fixture
+def model(monkeypatch):
+    m = LettersModel()
+    monkeypatch.setenv("EMBEDDING_CACHE", "no")
+    monkeypatch.setattr(comparison, "embedding_model", m)
+    monkeypatch.setattr(comparison, "cache", comparison.VectorCache(1024 * 1024))
+    return m
+
+
+# sliced matrix is the same as computed per pair, and the model is called once for all strings
+def test_embedding_matrix_slices_cosine(model):
+    items1 = ["auth", "users", "goods"]
+    items2 = ["Authentication service", "Users service"]
+    embeddings = EmbeddingMatrix(items1 + items2 + ["auth"])
+    assert len(model.calls) == 1
+    assert len(model.calls[0]) == 5
+
+    expected = map_texts_cosine_with_cache(items1, items2)
+    assert np.allclose(embeddings.cosine(items1, items2), expected, atol=1e-6)
+
+
+ITEMS = ["auth", "users", "Goods", "AUTH_TOKEN", "userId", "database url", "MAX_RETRIES", "getUserName", "HTTPServer",
+    "Authentication service", "Users service", "the quick brown fox jumps over", "café au lait", "a-b c", "123"]
+
+# matrix scorer gives the same scores as hybrid_score cell by cell
+def test_hybrid_score_matrix_parity():
+    items1 = ITEMS + [a + " " + b for a, b in zip(ITEMS, reversed(ITEMS))]
+    items2 = [b + " " + a for a, b in zip(ITEMS, ITEMS[3:])] + ITEMS
+    cosine = np.random.RandomState(0).rand(len(items1), len(items2)).astype(np.float32)
+    expected = [[hybrid_score(a, b, cosine[i][j]) for j, b in enumerate(items2)] for i, a in enumerate(items1)]
+    assert np.allclose(hybrid_score_matrix(items1, items2, cosine), expected, atol=1e-6)
+
+
+# previous implementation over the full DP table, kept as a reference
+def dp_longest_common_substring_score(a, b):
+    a, b = a.lower(), b.lower()
+    m, n = len(a), len(b)
+    if m == 0 or n == 0:
+        return 0.0
+    dp = [[0]*(n+1) for _ in range(m+1)]
+    max_len = 0
+    j_of_max = 0
+    for i in range(m):
+        for j in range(n):
+            if a[i] == b[j]:
+                dp[i+1][j+1] = dp[i][j] + 1
+                if dp[i+1][j+1] > max_len:
+                    max_len = dp[i+1][j+1]
+                    j_of_max = j
+    start_j = j_of_max + 1 - max_len
+    denom = (n - max_len + 1) if (n - max_len + 1) else 1
+    position_factor = max(0, min(1.0 - (start_j / denom), 1))
+    return max_len / min(m, n) * position_factor
+
+# small alphabet gives many equal-length matches, so the choice of the match position is checked too
+def test_longest_common_substring_score_parity():
+    rnd = random.Random(0)
+    for _ in range(3000):
+        a = "".join(rnd.choice("abcAB _") for _ in range(rnd.randint(0, 25)))
+        b = "".join(rnd.choice("abcab _") for _ in range(rnd.randint(0, 25)))
+        assert longest_common_substring_score(a, b) == dp_longest_common_substring_score(a, b)
+
+
+# 2 closest rows for every row, masked pairs are skipped
+def test_top_k_neighbours():
+    sigs1 = np.array([[1.0, 0.0], [0.0, 1.0]])
+    sigs2 = np.array([[0.9, 0.1], [0.1, 0.9], [0.7, 0.7], [-1.0, 0.0]])
+    mask = np.array([[True, True, True, True], [True, False, True, True]])
+    assert top_k_neighbours(sigs1, sigs2, 2, mask=lambda start, stop: mask[start:stop], block_size=1) == [[0, 2], [0, 2]]
+
+
+# least recently used vectors are dropped above the limit
+def test_vector_cache_bounded():
+    cache = comparison.VectorCache(max_bytes=2 * 4 * 4)
+    cache.put("a", np.zeros(4, dtype=np.float32))
+    cache.put("b", np.zeros(4, dtype=np.float32))
+    cache.get("a")
+    cache.put("c", np.zeros(4, dtype=np.float32))
+    assert list(cache.items) == ["a", "c"]
+    assert cache.get("b") is None
+    assert cache.size == 32
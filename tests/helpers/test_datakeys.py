@@ -0,0 +1,61 @@
+import pytest
+import io
+import json
+import yaml
+from src.core.facts import collect_yaml_keys, IgnoreUnknownTagsLoader
+from src.helpers.datakeys import yaml_key_groups, json_key_groups
+
+YAML_CONTENT = """
+app:
+  name: doctor
+  db: {host: localhost, port: 5432}
+  steps: [1, {skipped: 1}]
+  custom: !vault secret
+base: &base
+  retries: 3
+  timeouts: {read: 1}
+service:
+  <<: *base
+  retries: 5
+  url: http://localhost
+copy: *base
+1: number
+empty: {}
+"""
+
+def full_load_groups(data, type="YAML"):
+    key_groups = []
+    collect_yaml_keys(data, "root", key_groups, type)
+    return key_groups
+
+
+# same groups as collected from the loaded document
+def test_yaml_key_groups_same_as_full_load():
+    data = yaml.load(io.StringIO(YAML_CONTENT), Loader=IgnoreUnknownTagsLoader)
+    assert yaml_key_groups(io.StringIO(YAML_CONTENT), "root") == full_load_groups(data)
+
+
+def test_json_key_groups_same_as_full_load():
+    content = json.dumps({"a": {"b": 1, "c": {"d": [{"e": 1}]}}, "f": [], "g": {}})
+    assert json_key_groups(io.StringIO(content), "root", "YAML") == full_load_groups(json.loads(content))
+
+
+# repeated keys keep their first place and last value like a dict, values below the limit are only skipped
+def test_json_key_groups_walk():
+    content = '{"a": {"x": 1}, "b\\u00e9": [{"y": 1}], "a": 2, "c": {"z": {"w": 1}}, "c": {"v": "}"}}'
+    assert json_key_groups(io.StringIO(content), "root") == [("JSON", "root", ["a", "b\u00e9", "c"]), ("JSON", "c", ["v"])]
+    assert json_key_groups(io.StringIO(content), "root") == full_load_groups(json.loads(content), "JSON")
+    deep = '{"a": ' * 100000 + '1' + '}' * 100000
+    assert json_key_groups(io.StringIO(deep), "root", depth_limit=2) == [("JSON", "root", ["a"]), ("JSON", "a", ["a"])]
+    for broken in ['{"a": 1,}', '{"a" 1}', '{"a": [1, 2}}', '{"a": [1, 2}', '{"a": 1} x', '']:
+        assert json_key_groups(io.StringIO(broken), "root") == []
+
+
+# all documents are read, a broken one keeps groups of the documents before it
+def test_yaml_key_groups_documents_and_depth():
+    content = "a: {b: {c: {d: 1}}}\n---\ne: {f: 1}\n---\ng: [\n"
+    assert yaml_key_groups(io.StringIO(content), "root") == [
+        ("YAML", "root", ["a"]), ("YAML", "a", ["b"]), ("YAML", "b", ["c"]), ("YAML", "c", ["d"]),
+        ("YAML", "root", ["e"]), ("YAML", "e", ["f"])]
+    assert yaml_key_groups(io.StringIO(content), "root", depth_limit=2)[:2] == [
+        ("YAML", "root", ["a"]), ("YAML", "a", ["b"])]
@@ -0,0 +1,50 @@
+import pytest
+import numpy as np
+from src.helpers.comparison import model_name, cosine_similarity
+from src.helpers.embedding_backend import load_model, backend_key
+
+TEXTS = ["auth", "users", "AUTH_TOKEN", "database url", "getUserName", "Authentication service",
+    "Users service", "Continuous integration pipelines", "the quick brown fox jumps over", "## Install\npip install doctor"]
+
+# cosine of the reference model and how far it can go for other backends
+TOLERANCE = {"onnx": 0.01, "int8": 0.1}
+
+def load_or_skip(backend):
+    if backend == "onnx":
+        # sentence-transformers reports missing ones as a plain Exception
+        pytest.importorskip("onnxruntime")
+        pytest.importorskip("optimum")
+    try:
+        return load_model(model_name(), backend)
+    except ImportError as e:
+        pytest.skip(f"{backend} backend is not installed: {e}")
+    except OSError as e:
+        # no network to download the model
+        pytest.skip(f"model {model_name()} is not available: {e}")
+
+
+@pytest.mark.parametrize("backend", ["onnx", "int8"])
+def test_backend_cosine_close_to_reference(backend):
+    reference = load_or_skip("torch")
+    model = load_or_skip(backend)
+    expected = cosine_similarity(reference.encode(TEXTS), reference.encode(TEXTS))
+    actual = cosine_similarity(model.encode(TEXTS), model.encode(TEXTS))
+    assert np.abs(actual - expected).max() < TOLERANCE[backend]
+
+
+def test_backend_key():
+    assert backend_key("BAAI/bge-m3", "torch") == "BAAI/bge-m3"
+    assert backend_key("BAAI/bge-m3", "int8") == "BAAI/bge-m3@int8"
+    assert backend_key("BAAI/bge-m3", "onnx") == "BAAI/bge-m3@onnx"
+    assert backend_key("BAAI/bge-m3", "onnx", "onnx/model_qint8_avx512.onnx") == "BAAI/bge-m3@onnx:onnx/model_qint8_avx512.onnx"
+
+
+# another content of the same local ONNX file is another key
+def test_backend_key_local_onnx_digest(tmp_path):
+    (tmp_path / "onnx").mkdir()
+    (tmp_path / "onnx" / "model.onnx").write_bytes(b"fp32")
+    key1 = backend_key(str(tmp_path), "onnx", "onnx/model.onnx")
+    (tmp_path / "onnx" / "model.onnx").write_bytes(b"int8")
+    key2 = backend_key(str(tmp_path), "onnx", "onnx/model.onnx")
+    assert key1 != key2
+    assert key1.startswith(f"{tmp_path}@onnx:onnx/model.onnx:")
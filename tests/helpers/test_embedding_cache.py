@@ -0,0 +1,98 @@
+import pytest
+import os
+import numpy as np
+from src.helpers.embedding_cache import EmbeddingStore
+
+def vectors(n, dim=4):
+    return np.arange(n * dim, dtype=np.float32).reshape(n, dim)
+
+# stored vectors survive a new store instance, which reads them from the memory-mapped file
+def test_embedding_store_roundtrip(tmp_path):
+    store = EmbeddingStore("some/model", cache_dir=str(tmp_path))
+    store.add(["auth", "users"], vectors(2))
+    store.flush()
+
+    store = EmbeddingStore("some/model", cache_dir=str(tmp_path))
+    found = store.lookup(["auth", "users", "goods"])
+    assert sorted(found) == ["auth", "users"]
+    assert np.array_equal(found["users"], vectors(2)[1])
+
+
+# the same text under another model is another key
+def test_embedding_store_keyed_by_model(tmp_path):
+    store = EmbeddingStore("model-a", cache_dir=str(tmp_path))
+    store.add(["auth"], vectors(1))
+    store.flush()
+
+    store = EmbeddingStore("model-b", cache_dir=str(tmp_path))
+    assert store.lookup(["auth"]) == {}
+
+
+# only 2 rows fit, the least recently used one is evicted
+def test_embedding_store_evicts_least_recently_used(tmp_path):
+    store = EmbeddingStore("some/model", cache_dir=str(tmp_path), max_bytes=2 * 4 * 4)
+    store.add(["a", "b"], vectors(2))
+    store.flush()
+    store.lookup(["a"])
+    store.add(["c"], vectors(1))
+    store.flush()
+
+    store = EmbeddingStore("some/model", cache_dir=str(tmp_path))
+    assert sorted(store.lookup(["a", "b", "c"])) == ["a", "c"]
+
+
+# two stores loaded from the same generation, like fleet workers, both keep their rows
+def test_embedding_store_merges_concurrent_flush(tmp_path):
+    store1 = EmbeddingStore("some/model", cache_dir=str(tmp_path))
+    store2 = EmbeddingStore("some/model", cache_dir=str(tmp_path))
+    store1.add(["a"], vectors(1))
+    store1.flush()
+    store2.add(["b"], vectors(1))
+    store2.flush()
+
+    store = EmbeddingStore("some/model", cache_dir=str(tmp_path))
+    assert sorted(store.lookup(["a", "b"])) == ["a", "b"]
+    assert len([f for f in os.listdir(store.path) if f.endswith(".npy")]) == 1
+
+
+# reading the cache only updates the index, the vectors file is not written again
+def test_embedding_store_hits_keep_vectors_file(tmp_path):
+    store = EmbeddingStore("some/model", cache_dir=str(tmp_path), max_bytes=2 * 4 * 4)
+    store.add(["a", "b"], vectors(2))
+    store.flush()
+    vectors_file = store.vectors_file
+    mtime = os.stat(os.path.join(store.path, vectors_file)).st_mtime_ns
+
+    store = EmbeddingStore("some/model", cache_dir=str(tmp_path), max_bytes=2 * 4 * 4)
+    assert sorted(store.lookup(["a"])) == ["a"]
+    store.flush()
+    assert os.stat(os.path.join(store.path, vectors_file)).st_mtime_ns == mtime
+
+    # the recency is still kept: "b" is the least recently used one now
+    store = EmbeddingStore("some/model", cache_dir=str(tmp_path), max_bytes=2 * 4 * 4)
+    assert store.vectors_file == vectors_file
+    store.add(["c"], vectors(1))
+    store.flush()
+    store = EmbeddingStore("some/model", cache_dir=str(tmp_path))
+    assert sorted(store.lookup(["a", "b", "c"])) == ["a", "c"]
+
+
+def add_and_flush(cache_dir, worker):
+    for round in range(5):
+        store = EmbeddingStore("some/model", cache_dir=cache_dir)
+        store.add([f"{worker}-{round}"], vectors(1))
+        store.flush()
+
+
+# processes flushing at the same time don't lose rows or leave generations behind
+def test_embedding_store_concurrent_processes(tmp_path):
+    import multiprocessing
+    context = multiprocessing.get_context("fork" if "fork" in multiprocessing.get_all_start_methods() else "spawn")
+    processes = [context.Process(target=add_and_flush, args=(str(tmp_path), worker)) for worker in range(4)]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+    store = EmbeddingStore("some/model", cache_dir=str(tmp_path))
+    assert len(store.lookup([f"{worker}-{round}" for worker in range(4) for round in range(5)])) == 20
+    assert [f for f in os.listdir(store.path) if f.startswith("vectors-")] == [store.vectors_file]
@@ -0,0 +1,54 @@
+import pytest
+import multiprocessing
+import numpy as np
+from src.helpers.embedding_service import EmbeddingService, ProcessBridge
+
+class LengthModel:
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, texts):
+        self.calls.append(list(texts))
+        return np.array([[len(t), 1.0] for t in texts])
+
+
+# requests coming within the latency bound go to the model in one call, each gets its own rows
+def test_embedding_service_coalesces_requests():
+    model = LengthModel()
+    service = EmbeddingService(model, max_batch=64, latency=0.5)
+    futures = [service.submit(["a", "bb"]), service.submit(["bb", "ccc"]), service.submit(["dddd"])]
+    results = [f.result(timeout=5) for f in futures]
+    service.close()
+    assert model.calls == [["a", "bb", "ccc", "dddd"]]
+    assert results[1].tolist() == [[2, 1], [3, 1]]
+    assert results[2].tolist() == [[4, 1]]
+
+
+# a full batch doesn't wait for the latency bound, errors of the model go to every caller
+def test_embedding_service_batch_limit_and_errors():
+    model = LengthModel()
+    service = EmbeddingService(model, max_batch=2, latency=5)
+    assert service.submit(["a", "b"]).result(timeout=1).shape == (2, 2)
+
+    def broken(texts):
+        raise ValueError("broken model")
+    service.encode = broken
+    with pytest.raises(ValueError):
+        service.submit(["a", "b"]).result(timeout=1)
+    service.close()
+
+
+def encode_in_child(bridge, results):
+    results.put(bridge.connect().submit(["abc"]).result().tolist())
+
+# forked process gets embeddings from the service of the parent
+def test_process_bridge():
+    context = multiprocessing.get_context("fork")
+    bridge = ProcessBridge(1)
+    results = context.Queue()
+    child = context.Process(target=encode_in_child, args=(bridge, results))
+    child.start()
+    bridge.start(EmbeddingService(LengthModel(), latency=0))
+    assert results.get(timeout=10) == [[3, 1]]
+    child.join()
+    bridge.close()
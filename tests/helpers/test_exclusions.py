@@ -0,0 +1,22 @@
+import pytest
+from src.helpers.exclusions import trie_regex, GitIgnore, paths_exclusions
+
+# compiled matcher finds the same paths as substring checks
+def test_trie_regex_same_as_substrings():
+    matcher = trie_regex(paths_exclusions)
+    paths = ["/srv/app/node_modules/a.js", "/srv/app/src/main.py", "/srv/app/dist/x.js", "/srv/app/distance.py",
+        "/srv/app/.venv/lib.py", "/srv/app/environment.py", "/srv/app/Build.gradle", "/srv/app/target/x.class"]
+    for path in paths:
+        assert (matcher.search(path) is not None) == any(pe in path for pe in paths_exclusions)
+
+
+def test_gitignore_patterns():
+    gitignore = GitIgnore("/srv/app", ["# comment", "*.log", "!keep.log", "build/", "/local.txt", "docs/**/*.tmp"])
+    assert gitignore.match("/srv/app/a/b.log") is True
+    assert gitignore.match("/srv/app/a/keep.log") is False
+    assert gitignore.match("/srv/app/a/build", is_dir=True) is True
+    assert gitignore.match("/srv/app/a/build") is None # only folders
+    assert gitignore.match("/srv/app/local.txt") is True
+    assert gitignore.match("/srv/app/a/local.txt") is None # anchored to the root
+    assert gitignore.match("/srv/app/docs/a/b/c.tmp") is True
+    assert gitignore.match("/srv/other/b.log") is None
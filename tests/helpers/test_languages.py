@@ -0,0 +1,149 @@
+import pytest
+import os
+from src.helpers import languages
+from src.helpers.languages import FactsCache, invoke_lang
+
+def create_file(path, fname, content):
+    filename = os.path.join(path, fname)
+    with open(filename, "w") as f:
+        f.write(content)
+    return filename
+
+
+def test_facts_cache_evicts_least_recently_used():
+    cache = FactsCache(max_bytes=3 * languages.facts_size(["AUTH_TOKEN"]))
+    cache.put("a", ["AUTH_TOKEN"])
+    cache.put("b", ["AUTH_TOKEN"])
+    cache.get("a")
+    cache.put("c", ["AUTH_TOKEN"])
+    cache.put("d", ["AUTH_TOKEN"])
+    assert list(cache.items) == ["a", "c", "d"]
+    assert cache.get("b") == (False, None)
+
+
+# facts come from the cache until the file changes, only the last plugin instance is kept
+def test_invoke_lang_caches_facts_not_contents(tmp_path, monkeypatch):
+    monkeypatch.setattr(languages, "FACTS_CACHE", FactsCache(1024 * 1024))
+    f1 = create_file(tmp_path, "a.py", "import os\nx = os.getenv('AUTH_TOKEN')\n")
+    f2 = create_file(tmp_path, "b.py", "import os\n")
+    assert invoke_lang(f1, "fetch_env_vars") == ["AUTH_TOKEN"]
+    assert invoke_lang(f2, "fetch_imports") == {"os"}
+    assert languages.last_instance.key[0] == f2
+
+    create_file(tmp_path, "a.py", "import os\nx = os.getenv('AUTH_SECRET_TOKEN')\n")
+    os.utime(f1, ns=(0, 10**9))
+    assert invoke_lang(f1, "fetch_env_vars") == ["AUTH_SECRET_TOKEN"]
+    assert invoke_lang(os.path.join(tmp_path, "README.md"), "fetch_env_vars") is None
+
+
+# env vars, comparisons, imports and the main marker come from one parse of the file
+def test_python_facts_single_parse(tmp_path, monkeypatch):
+    import ast
+    from src.languages.classes.python import LanguagePlugin
+    parses = []
+    parse = ast.parse
+    monkeypatch.setattr(ast, "parse", lambda *args, **kwargs: parses.append(1) or parse(*args, **kwargs))
+    f = create_file(tmp_path, "main.py", """import os
+from .config import settings
+token = os.environ.get("AUTH_TOKEN")
+# os.getenv("IN_COMMENT")
+if os.environ["MODE"] == "debug":
+    pass
+if __name__ == "__main__":
+    pass
+""")
+    plugin = LanguagePlugin(f)
+    assert sorted(plugin.fetch_env_vars()) == ["AUTH_TOKEN", "MODE"]
+    assert plugin.fetch_comparisons() == {"debug", "__main__"}
+    assert plugin.fetch_imports() == {"os", ".config", ".config.settings"}
+    assert plugin.fetch_main_marker() is True
+    assert len(parses) == 1
+
+
+# not valid python, env vars and imports are still found by regular expressions
+def test_python_facts_fallback(tmp_path):
+    from src.languages.classes.python import LanguagePlugin
+    f = create_file(tmp_path, "broken.py", "\"\nimport os\ns1 = os.getenv(\"AUTH\")\n")
+    plugin = LanguagePlugin(f)
+    assert plugin.fetch_env_vars() == ["AUTH"]
+    assert plugin.fetch_imports() == {"os"}
+    assert plugin.fetch_main_marker() is False
+    with pytest.raises(SyntaxError):
+        plugin.fetch_comparisons()
+
+
+JS_SOURCE = """import { a } from "./a";
+export * from "../b";
+const c = require('c');
+// process.env.IN_COMMENT
+const mode: string = process.env.MODE as string;
+if (process.env["AUTH_TOKEN"] !== 'none' && mode === `debug`) {
+    import("./lazy");
+}
+url.startsWith("https");
+"""
+
+# env vars, comparisons and imports from one walk over the syntax tree
+def test_typescript_facts_tree_sitter(tmp_path):
+    pytest.importorskip("tree_sitter_typescript")
+    from src.languages.classes.javascript import LanguagePlugin
+    f = create_file(tmp_path, "app.ts", JS_SOURCE)
+    plugin = LanguagePlugin(f)
+    assert sorted(plugin.fetch_env_vars()) == ["AUTH_TOKEN", "MODE"]
+    assert plugin.fetch_comparisons() == {"none", "debug", "https"}
+    assert plugin.fetch_imports() == {"./a", "../b", "c", "./lazy"}
+
+
+# the changed file is parsed from its previous tree, the result is the same as a full parse
+def test_javascript_incremental_reparse(monkeypatch):
+    pytest.importorskip("tree_sitter_javascript")
+    from src.languages import jsparser
+    monkeypatch.setenv("JS_TREE_CACHE_MB", "1")
+    before = b"const a = process.env.A;\nif (a == 'x') {}\n"
+    after = b"const a = process.env.A;\nconst b = process.env.B;\nif (a == 'y') {}\n"
+    edits = []
+    edited_tree = jsparser.edited_tree
+    monkeypatch.setattr(jsparser, "edited_tree", lambda tree, old, new: edits.append((old, new)) or edited_tree(tree, old, new))
+    jsparser.parse("/virtual/app.js", before, "js")
+    assert jsparser.parse("/virtual/app.js", before, "js") is jsparser.state.trees["/virtual/app.js"][1]
+    assert edits == []
+    tree = jsparser.parse("/virtual/app.js", after, "js")
+    assert edits == [(before, after)]
+    assert str(tree.root_node) == str(jsparser.parser_for("js").parse(after).root_node)
+
+# trees are kept only when asked, counted with their nodes, pool workers keep none
+def test_javascript_tree_cache_limit(monkeypatch):
+    pytest.importorskip("tree_sitter_javascript")
+    from src.languages import jsparser
+    from src.core.facts import init_facts_worker
+    source = b"const a = process.env.A;\n" * 20
+    jsparser.parser_for("js")
+    monkeypatch.setattr(jsparser.state, "trees", jsparser.OrderedDict())
+    monkeypatch.setattr(jsparser.state, "trees_size", 0)
+    monkeypatch.delenv("JS_TREE_CACHE_MB", raising=False)
+    jsparser.parse("/virtual/a.js", source, "js")
+    assert not jsparser.state.trees
+    monkeypatch.setenv("JS_TREE_CACHE_MB", "1")
+    tree = jsparser.parse("/virtual/a.js", source, "js")
+    size = jsparser.cached_size(source, tree)
+    assert size > len(source) * 2
+    assert jsparser.state.trees_size == size
+    monkeypatch.setenv("JS_TREE_CACHE_MB", str(size * 1.5 / 1024 / 1024))
+    jsparser.parse("/virtual/b.js", source, "js")
+    assert list(jsparser.state.trees) == ["/virtual/b.js"]
+    assert jsparser.state.trees_size == size
+    init_facts_worker()
+    jsparser.parse("/virtual/c.js", source, "js")
+    assert "/virtual/c.js" not in jsparser.state.trees
+
+
+# without tree-sitter the same facts come from regular expressions
+def test_javascript_facts_regex_fallback(tmp_path, monkeypatch):
+    from src.languages import jsparser
+    from src.languages.classes.javascript import LanguagePlugin
+    monkeypatch.setattr(jsparser, "parser_for", lambda ext: None)
+    f = create_file(tmp_path, "app.js", "const t = require('c');\nif (process.env.MODE === 'debug') {}\n")
+    plugin = LanguagePlugin(f)
+    assert plugin.fetch_env_vars() == ["MODE"]
+    assert plugin.fetch_comparisons() == {"debug"}
+    assert plugin.fetch_imports() == {"c"}
@@ -0,0 +1,43 @@
+import random
+from src.helpers.search import InvertedIndex, retrieve, tokenize
+
+
+def test_tokenize():
+    assert tokenize("Set AUTH_TOKEN, see docs/install.md") == ["set", "auth", "token", "see", "docs", "install", "md"]
+
+
+# chunks with more of the rare query tokens come first, chunks without them are not returned
+def test_search_bm25_ranking():
+    index = InvertedIndex([
+        "Install with pip install doctor",
+        "Deployment to kubernetes with helm charts",
+        "Tests are run with pytest, the docker image is not needed for tests",
+        "Docker image is built in CI and deployed with docker compose",
+    ])
+    assert index.search("docker image", 2) == [3, 2]
+    assert index.search("pytest", 5) == [2]
+    assert index.search("terraform", 5) == []
+
+
+# the same texts as a substring scan of every text
+def test_containing_matches_substring_scan():
+    rng = random.Random(7)
+    words = ["auth", "token", "top_secret", "Production", "v1.2", "user-id", "ID", "-", "é"]
+    texts = [" ".join(rng.choice(words) for _ in range(rng.randint(0, 12))) for _ in range(50)]
+    index = InvertedIndex(texts)
+    for query in words + ["secret", "cret_t", "oduc", "uction v", "_", "2 u", "e-i", "missing", "1.2 auth"]:
+        assert index.containing(query) == [i for i, text in enumerate(texts) if query in text], query
+
+
+# union of the best chunks of every query, all chunks when retrieval can't help
+def test_retrieve_candidates_and_fallback():
+    texts = [f"section {i} about nothing" for i in range(30)] + ["docker compose deployment", "helm chart deployment"]
+    index = InvertedIndex(texts)
+    assert retrieve(index, ["docker", "helm"], n=5) == [30, 31]
+    # the only chunk mentioning docker comes first, then other deployment chunks
+    assert retrieve(index, ["docker deployment"], n=1) == [30]
+    # not more chunks than n
+    assert retrieve(index, ["docker"], n=40) is None
+    # 1 of 3 queries has lexical matches
+    assert retrieve(index, ["docker", "kubernetes", "terraform"], n=5, min_recall=0.5) is None
+    assert retrieve(index, ["docker", "kubernetes", "terraform"], n=5, min_recall=0.3) == [30]
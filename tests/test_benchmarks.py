@@ -0,0 +1,26 @@
+import pytest
+import os
+from src.helpers import comparison
+from benchmarks.scoring import run_benchmarks, compare, string_sets, HashingModel
+
+@pytest.fixture(autouse=True)
+def restore_model(monkeypatch):
+    monkeypatch.setattr(comparison, "embedding_model", None)
+
+
+# generated inputs and the stub model are the same from run to run
+def test_benchmark_inputs_are_deterministic():
+    assert string_sets(20) == string_sets(20)
+    model = HashingModel()
+    assert (model.encode(["auth token"]) == model.encode(["auth token"])).all()
+
+
+def test_benchmarks_run_and_compare(monkeypatch):
+    monkeypatch.delenv("EMBEDDING_CACHE", raising=False)
+    results = run_benchmarks(sizes=[5], repeat=1, name_filter="normalize_string")
+    assert list(results["results"]) == ["normalize_string[5]"]
+    slower = {"results": {name: dict(r, min=r["min"] * 2) for name, r in results["results"].items()}}
+    assert compare(slower, results, threshold=0.2)[0][-1] is True
+    assert compare(results, slower, threshold=0.2)[0][-1] is False
+    # the stub model's vectors were not cached, the setting is restored
+    assert "EMBEDDING_CACHE" not in os.environ
@@ -0,0 +1,15 @@
+import pytest
+import os
+import sys
+import subprocess
+
+HEAVY_MODULES = ["torch", "sentence_transformers", "transformers", "sklearn", "langchain"]
+
+# the model stack is loaded only when similarity is computed, importing use cases stays fast
+def test_use_cases_import_without_model_stack():
+    code = ("import sys\n"
+        "import src.ucases.validation, src.ucases.parallents, src.ucases.common, src.ucases.endpoints, src.core.project\n"
+        f"print(','.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))")
+    root = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+    out = subprocess.run([sys.executable, "-c", code], cwd=root, capture_output=True, text=True, check=True)
+    assert out.stdout.strip() == ""
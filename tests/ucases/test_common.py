@@ -64,6 +64,48 @@ pdm install
     
 
 
+# only the best lexical candidates among the chunks are embedded
+def test_is_mentioned_retrieval(monkeypatch):
+    import numpy as np
+    from src.helpers import comparison
+    from src.helpers.search import InvertedIndex
+    from src.ucases.common import is_mentioned
+    encoded = []
+    def encode_texts(texts):
+        encoded.extend(texts)
+        return np.array([[1.0, "pytest" in t.lower()] for t in texts])
+    monkeypatch.setattr(comparison, "encode_texts", encode_texts)
+    chunks = [f"Chapter {i} of the user guide" for i in range(200)] + ["Unit tests are run with pytest"]
+    assert is_mentioned("Tests", chunks, InvertedIndex(chunks))
+    assert "Unit tests are run with pytest" in encoded
+    assert len(encoded) <= 21
+
+
+# first category in order wins, the same as checking patterns one by one
+def test_classify_file():
+    from src.ucases.common import classify_file
+    assert classify_file("/p/.github/workflows/tests.yml") == "CI/CD"
+    assert classify_file("/p/infra/main.tf") == "Infrastructure as Code"
+    assert classify_file("/p/docker-compose.yml") == "Deployment process"
+    assert classify_file("/p/src/app_test.py") == "Tests"
+    assert classify_file("/p/src/main.py") is None
+
+
+# docs are checked once per category, not once per file
+def test_common_mentioned_once_per_category(monkeypatch):
+    from src.ucases import common
+    path_to_project = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "mocks", "ucases", "common")
+    os.makedirs(path_to_project, exist_ok=True)
+    create_file(path_to_project, "README.md", "Hello")
+    for i in range(5):
+        create_file(path_to_project, f"module{i}_test.py", "")
+    calls = []
+    monkeypatch.setattr(common, "is_mentioned", lambda cat, chunks, index=None: calls.append(cat) or False)
+    r = common.report(Project(path_to_project))
+    assert calls == ["Tests"]
+    assert len(r.advices) == 5
+
+
 def clean_folder(path):
     for item in os.listdir(path):
         full_path = os.path.join(path, item)
@@ -1,7 +1,7 @@
 import pytest
 import shutil
 import os
-from src.ucases.endpoints import report
+from src.ucases.endpoints import report, get_eindpoints
 from src.core.project import Project
 
 # Remove test paths from exclusions
@@ -40,6 +40,50 @@ def test_endpoints_uc_documented():
     assert len(r.advices) == 0
 
 
+# relative imports are resolved against the package, "import os" doesn't make hosts.py imported
+def test_endpoints_import_graph():
+    path_to_project = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "mocks", "ucases", "endpoints")
+    pkg = os.path.join(path_to_project, "app")
+    os.makedirs(pkg, exist_ok=True)
+    create_file(path_to_project, "README.md", "Hello")
+    create_file(pkg, "__init__.py", "")
+    main = create_file(pkg, "main.py", "import os\nfrom .helpers import load\nfrom . import models\n")
+    create_file(pkg, "helpers.py", "def load():\n    pass\n")
+    create_file(pkg, "models.py", "from app.helpers import load\n")
+    hosts = create_file(path_to_project, "hosts.py", "print(1)")
+    p = Project(path_to_project)
+    assert sorted(get_eindpoints(p)) == sorted([main, hosts])
+
+
+# imported, but also run as a script
+def test_endpoints_main_marker():
+    path_to_project = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "mocks", "ucases", "endpoints")
+    os.makedirs(path_to_project, exist_ok=True)
+    create_file(path_to_project, "README.md", "Hello")
+    main = create_file(path_to_project, "main.py", "import tool\n")
+    tool = create_file(path_to_project, "tool.py", "def run():\n    pass\n\nif __name__ == \"__main__\":\n    run()\n")
+    create_file(path_to_project, "lib.py", "")
+    create_file(path_to_project, "cli.py", "import lib\n")
+    p = Project(path_to_project)
+    assert sorted(get_eindpoints(p)) == sorted([main, tool, os.path.join(path_to_project, "cli.py")])
+
+
+# imports are looked up from the importing package up, a stdlib name doesn't import a local module
+def test_endpoints_import_resolution():
+    path_to_project = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "mocks", "ucases", "endpoints")
+    for folder in ["pkg", "other", os.path.join("src", "app")]:
+        os.makedirs(os.path.join(path_to_project, folder), exist_ok=True)
+    create_file(path_to_project, "README.md", "Hello")
+    run = create_file(os.path.join(path_to_project, "pkg"), "run.py", "import logging\nimport utils\n")
+    local_logging = create_file(os.path.join(path_to_project, "pkg"), "logging.py", "")
+    create_file(os.path.join(path_to_project, "pkg"), "utils.py", "")
+    other_utils = create_file(os.path.join(path_to_project, "other"), "utils.py", "")
+    main = create_file(os.path.join(path_to_project, "src", "app"), "main.py", "from app.db import connect\n")
+    create_file(os.path.join(path_to_project, "src", "app"), "db.py", "def connect():\n    pass\n")
+    p = Project(path_to_project)
+    assert sorted(get_eindpoints(p)) == sorted([run, local_logging, other_utils, main])
+
+
 def clean_folder(path):
     for item in os.listdir(path):
         full_path = os.path.join(path, item)
@@ -129,6 +129,36 @@ def test_paralents_root_files_not_documented():
     assert len(r.advices) == 0
 
 
+# closest doc groups of similar size, masks built per block of code groups
+def test_candidate_pairs_blocks():
+    import numpy as np
+    from src.ucases.parallents import Parallents, candidate_pairs
+    class FirstLetter:
+        def mean(self, items):
+            return np.array([items[0].startswith("a"), items[0].startswith("b")], dtype=float)
+    code = [Parallents("EnvVar", f"c{i}", ["a1", "a2"] if i % 2 else ["b1", "b2"]) for i in range(5)]
+    docs = [Parallents("doc_lists", "d0", ["a1", "a2"]), Parallents("doc_lists", "d1", ["b1", "b2", "b3"]),
+        Parallents("doc_lists", "d2", ["a"] * 9)]
+    pairs = candidate_pairs(code, docs, FirstLetter(), 1)
+    assert [(p1.parent, p2.parent) for p1, p2 in pairs] == [("c0", "d1"), ("c1", "d0"), ("c2", "d1"), ("c3", "d0"), ("c4", "d1")]
+
+
+# binary files are not read, but they are still items of their folder
+def test_collect_code_items_keeps_skipped_files():
+    from src.ucases.parallents import collect_code_items
+    path_to_project = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "mocks", "ucases", "parallents")
+    sf = os.path.join(path_to_project, "services")
+    os.makedirs(sf, exist_ok=True)
+    create_file(path_to_project, "README.md", "Hello")
+    create_file(sf, "auth.py", "print(1)")
+    with open(os.path.join(sf, "users.bin"), "wb") as f:
+        f.write(b"\0\1")
+    p = Project(path_to_project)
+    assert "users.bin" in p.walk_items[1].skipped
+    folders = [par.items for par in collect_code_items(p) if par.parent == sf]
+    assert [sorted(items) for items in folders] == [["auth", "users"]]
+
+
 def clean_folder(path):
     for item in os.listdir(path):
         full_path = os.path.join(path, item)
@@ -51,6 +51,25 @@ def check_auth(header):
     assert len(r.advices) == 0
 
 
+# documented in docs/, not in README.md
+def test_validation_documented_in_docs():
+    path_to_project = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "mocks", "ucases", "validation")
+    sf = os.path.join(path_to_project, "services")
+    os.makedirs(sf, exist_ok=True)
+    os.makedirs(os.path.join(path_to_project, "docs"), exist_ok=True)
+    create_file(path_to_project, "README.md", "# Services\nHello world\n##")
+    create_file(os.path.join(path_to_project, "docs"), "auth.md", "# Auth\nSend the header 'top_secret'\n")
+    create_file(sf, "service.py", """
+def check_auth(header):
+    if header == "top_secret":
+        return True
+    return False
+""")
+    p = Project(path_to_project)
+    r = report(p)
+    assert len(r.advices) == 0
+
+
 def clean_folder(path):
     for item in os.listdir(path):
         full_path = os.path.join(path, item)